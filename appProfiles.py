@@ -0,0 +1,226 @@
+## appProfiles.py - per-app run time distributions extracted from monitoring databases
+##
+## Every try's runTime (running -> returned) is added to a small quantile
+## sketch for its app.  A sketch keeps counts in logarithmic buckets, so any
+## quantile is returned within a fixed relative error (1% by default) no
+## matter how many tries were added, and sketches from different databases
+## can be merged.  Profiles are saved as JSON together with the run_ids
+## already read, so updating them only reads runs that are new since the
+## last update (runs still in progress are left for a later update).
+##
+##   $ python appProfiles.py -f monitoring.db -p appProfiles.json
+##
+## From Python:
+##   profiles = appProfiles('appProfiles.json')
+##   profiles.update('monitoring.db')
+##   profiles.quantile('app_G', 0.9)                  # seconds
+##   profiles.priority()                               # longest apps first
+##   profiles.predictMakespan({'app_A': 10, 'app_G': 4}, workers=4)
+
+import sys, os
+import math
+import json
+import sqlite3
+import argparse
+
+## Completed runs, and every finished try of one run
+profileRuns = "select run_id from workflow where time_completed is not null"
+profileTries = (
+    'select t.task_func_name as appname,'
+    '(julianday(y.task_try_time_returned)-julianday(y.task_try_time_running))*86400 as runTime '
+    'from try y '
+    'join task t on (t.run_id=y.run_id and t.task_id=y.task_id) '
+    "where y.run_id=? and y.task_try_time_running is not null and y.task_try_time_returned is not null"
+)
+
+
+class durationSketch:
+    ### class durationSketch - mergeable quantile sketch with relative error alpha
+    def __init__(self, alpha=0.01):
+        self.alpha = alpha
+        self.gamma = (1. + alpha) / (1. - alpha)
+        self.bins = {}  # {bucket index:count}, bucket i holds (gamma^(i-1), gamma^i]
+        self.zero = 0  # durations <= 0 (clock resolution)
+        self.count = 0
+        self.sum = 0.
+        self.min = None
+        self.max = None
+        return
+
+    def add(self, x, n=1):
+        ## Add n observations of duration x (seconds)
+        if x <= 0:
+            self.zero += n
+        else:
+            i = math.ceil(math.log(x, self.gamma))
+            self.bins[i] = self.bins.get(i, 0) + n
+            pass
+        self.count += n
+        self.sum += x * n
+        if self.min is None or x < self.min: self.min = x
+        if self.max is None or x > self.max: self.max = x
+        return
+
+    def merge(self, other):
+        ## Add all observations of another sketch with the same alpha
+        if other.alpha != self.alpha: raise ValueError('cannot merge sketches with different alpha')
+        for (i, n) in other.bins.items():
+            self.bins[i] = self.bins.get(i, 0) + n
+            pass
+        self.zero += other.zero
+        self.count += other.count
+        self.sum += other.sum
+        for x in [other.min, other.max]:
+            if x is None: continue
+            if self.min is None or x < self.min: self.min = x
+            if self.max is None or x > self.max: self.max = x
+            pass
+        return
+
+    def quantile(self, q):
+        ## Duration at quantile q (0-1), or None if empty
+        if self.count == 0: return None
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if rank < seen: return 0.
+        for i in sorted(self.bins):
+            seen += self.bins[i]
+            if rank < seen:
+                x = 2. * self.gamma ** i / (self.gamma + 1.)  # bucket midpoint, within alpha of any member
+                return min(max(x, self.min), self.max)
+            pass
+        return self.max
+
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def toDict(self):
+        return {'alpha': self.alpha, 'bins': {str(i): n for (i, n) in sorted(self.bins.items())},
+                'zero': self.zero, 'count': self.count, 'sum': self.sum, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def fromDict(cls, d):
+        sketch = cls(alpha=d['alpha'])
+        sketch.bins = {int(i): n for (i, n) in d['bins'].items()}
+        for key in ['zero', 'count', 'sum', 'min', 'max']:
+            setattr(sketch, key, d[key])
+            pass
+        return sketch
+
+
+class appProfiles:
+    ### class appProfiles - per-app durationSketch collection, saved as JSON
+    def __init__(self, path=None, alpha=0.01):
+        self.path = path
+        self.alpha = alpha
+        self.sketches = {}  # {appname:durationSketch}
+        self.runs = set()  # run_ids already added
+        if path is not None and os.path.exists(path): self.load(path)
+        return
+
+    def load(self, path):
+        with open(path) as f:
+            d = json.load(f)
+            pass
+        self.alpha = d['alpha']
+        self.runs = set(d['runs'])
+        self.sketches = {app: durationSketch.fromDict(s) for (app, s) in d['apps'].items()}
+        return
+
+    def save(self, path=None):
+        ## Write the profiles (to a temporary file first, so readers never see half a file)
+        path = path or self.path
+        d = {'alpha': self.alpha, 'runs': sorted(self.runs),
+             'apps': {app: s.toDict() for (app, s) in sorted(self.sketches.items())}}
+        with open(path + '.tmp', 'w') as f:
+            json.dump(d, f, indent=1)
+            pass
+        os.replace(path + '.tmp', path)
+        return
+
+    def update(self, dbfile):
+        ## Add the tries of every completed run not yet in the profiles.
+        ##   Returns (#runs, #tries) added.
+        con = sqlite3.connect(f'file:{os.path.abspath(dbfile)}?mode=ro', uri=True, timeout=30)
+        nRuns = nTries = 0
+        try:
+            for (runID,) in con.execute(profileRuns).fetchall():
+                if runID in self.runs: continue
+                for (app, runTime) in con.execute(profileTries, (runID,)):
+                    if app not in self.sketches: self.sketches[app] = durationSketch(self.alpha)
+                    self.sketches[app].add(runTime)
+                    nTries += 1
+                    pass
+                self.runs.add(runID)
+                nRuns += 1
+                pass
+        finally:
+            con.close()
+        return (nRuns, nTries)
+
+    def apps(self):
+        return sorted(self.sketches)
+
+    def quantile(self, app, q=0.5):
+        ## Run time of app at quantile q, None for an unknown app
+        return self.sketches[app].quantile(q) if app in self.sketches else None
+
+    def mean(self, app):
+        return self.sketches[app].mean() if app in self.sketches else None
+
+    def priority(self, apps=None, q=0.9):
+        ## Apps ordered longest first by their q quantile, e.g., to submit
+        ## long tasks early (longest-processing-time first scheduling)
+        apps = self.apps() if apps is None else [app for app in apps if app in self.sketches]
+        return sorted(apps, key=lambda app: -self.quantile(app, q))
+
+    def predictMakespan(self, appCounts, workers, q=0.5):
+        ## Predicted makespan of independent tasks, {appname:#tasks}, on
+        ## workers using longest-first list scheduling with q quantile run
+        ## times.  Dependencies and queueing overheads are ignored, so this
+        ## is a lower-bound style estimate.  Unknown apps are skipped.
+        durations = []
+        for app in self.priority(appCounts.keys(), q):
+            durations += [self.quantile(app, q)] * appCounts[app]
+            pass
+        loads = [0.] * max(1, int(workers))
+        for d in durations:
+            k = loads.index(min(loads))
+            loads[k] += d
+            pass
+        return max(loads)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Build and update per-app run time profiles from Parsl '
+                                                 'monitoring databases.')
+    parser.add_argument('-f', '--files', nargs='+', default=['./monitoring.db'],
+                        help='monitoring database files (default=%(default)s)')
+    parser.add_argument('-p', '--profiles', default='appProfiles.json',
+                        help='profile file to create or update (default=%(default)s)')
+    parser.add_argument('-a', '--alpha', type=float, default=0.01,
+                        help='relative accuracy of new profiles (default=%(default)s)')
+    args = parser.parse_args()
+
+    from tabulate import tabulate
+
+    profiles = appProfiles(args.profiles, alpha=args.alpha)
+    for dbfile in args.files:
+        if not os.path.exists(dbfile):
+            print("%ERROR: monitoring database file not found, ", dbfile)
+            sys.exit(1)
+        (nRuns, nTries) = profiles.update(dbfile)
+        print(f'{dbfile}: added {nTries} tries from {nRuns} new runs')
+        pass
+    profiles.save()
+
+    rows = []
+    for app in profiles.priority(q=0.5):
+        s = profiles.sketches[app]
+        rows.append([app, s.count, s.mean()] + [s.quantile(q) for q in [0.1, 0.5, 0.9, 0.99]] + [s.max])
+        pass
+    print(f'\n{len(profiles.runs)} runs in {args.profiles}. Run time in seconds (quantiles within '
+          f'{100 * profiles.alpha:g}%).')
+    print(tabulate(rows, headers=['appname', '#tries', 'mean', 'p10', 'p50', 'p90', 'p99', 'max'],
+                   tablefmt='grid', floatfmt='.2f'))
@@ -5,17 +5,38 @@ pVersion = '1.1.0:desc'  ## Parsl version
 
 import sys, os
 import sqlite3
-from tabulate import tabulate
+import csv
+import json
 import datetime
 import argparse
-import matplotlib.pyplot as plt
-import pandas as pd
+import glob
+import multiprocessing
+import time
+import contextlib
+import re
+
+## Heavy dependencies (tabulate, numpy, pandas, matplotlib) are imported by
+## the functions that use them, so text reports start up quickly.
+
+
+def tabulate(*args, **kwargs):
+    ## Import 'tabulate' on first use
+    from tabulate import tabulate as _tabulate
+    return _tabulate(*args, **kwargs)
 
 ## Table format is used by 'tabulate' to select the text-based output format
 ## 'grid' looks nice but is non-compact
 ## 'psql' looks almost as nice and is more compact
 tblfmt = 'grid'
 
+## Streaming output formats (see pmon.streamRows) and the number of rows
+## fetched from the database per batch while streaming
+streamFormats = ['fixed', 'csv', 'jsonl']
+streamBatch = 1000
+
+## Maximum number of per-app histograms drawn on one plot canvas (page)
+plotPageSize = 16
+
 ## Selection of SQL commands used within pmon
 
 stdVariables = (
@@ -76,22 +97,147 @@ plotStats = (
     'order by tv.tasknum asc '
 )
 
+## Per-try resource usage, reduced inside sqlite so only one row per try
+## reaches Python.  psutil CPU times and I/O counters are cumulative for the
+## monitored process, so usage during a try is max-min over its samples.
+## Run and wait times are returned in seconds.
+
+resourceStats = (
+    'select y.run_id,y.task_id,y.try_id,'
+    't.task_func_name as appname,'
+    'y.hostname,'
+    "(julianday(y.task_try_time_returned)-julianday(y.task_try_time_running))*86400 as runTime,"
+    'r.samples,'
+    'r.cpuTime,'
+    'r.peakRSS,'
+    'r.readBytes,'
+    'r.writeBytes '
+    'from try y '
+    'join task t on (t.run_id=y.run_id and t.task_id=y.task_id) '
+    'join (select run_id,task_id,try_id,count(*) as samples,'
+    'max(psutil_process_time_user+psutil_process_time_system)'
+    '-min(psutil_process_time_user+psutil_process_time_system) as cpuTime,'
+    'max(psutil_process_memory_resident) as peakRSS,'
+    'max(psutil_process_disk_read)-min(psutil_process_disk_read) as readBytes,'
+    'max(psutil_process_disk_write)-min(psutil_process_disk_write) as writeBytes '
+    'from resource #where# group by run_id,task_id,try_id) r '
+    'on (r.run_id=y.run_id and r.task_id=y.task_id and r.try_id=y.try_id) '
+)
+
+## Launch, start and return time of every try, in (unix) seconds
+
+tryTimes = (
+    'select y.run_id,'
+    't.task_func_name as appname,'
+    'y.hostname,'
+    '(julianday(y.task_try_time_launched)-2440587.5)*86400 as launched,'
+    '(julianday(y.task_try_time_running)-2440587.5)*86400 as running,'
+    '(julianday(y.task_try_time_returned)-2440587.5)*86400 as returned '
+    'from try y '
+    'join task t on (t.run_id=y.run_id and t.task_id=y.task_id) '
+    '#where# '
+)
+
+## Every try of one run with its task's hashsum, for aligning tasks across
+## runs.  Times are returned in seconds.
+
+runTries = (
+    'select t.task_id,'
+    't.task_hashsum,'
+    't.task_func_name as appname,'
+    'y.try_id,'
+    '(julianday(y.task_try_time_running)-julianday(y.task_try_time_launched))*86400 as waitTime,'
+    '(julianday(y.task_try_time_returned)-julianday(y.task_try_time_running))*86400 as runTime,'
+    '(julianday(y.task_try_time_returned)-julianday(y.task_try_time_launched))*86400 as elapsedTime '
+    'from try y '
+    'join task t on (t.run_id=y.run_id and t.task_id=y.task_id) '
+    "where y.run_id='#runid#' "
+    'order by y.task_id,y.try_id'
+)
+
+## Every try with its task's dependencies and failure cost, for the
+## straggler report.  Times are unix seconds.
+
+dependTries = (
+    'select y.run_id,'
+    'y.task_id,'
+    'y.try_id,'
+    't.task_func_name as appname,'
+    't.task_depends,'
+    't.task_fail_cost,'
+    '(julianday(y.task_try_time_launched)-2440587.5)*86400 as launched,'
+    '(julianday(y.task_try_time_running)-2440587.5)*86400 as running,'
+    '(julianday(y.task_try_time_returned)-2440587.5)*86400 as returned '
+    'from try y '
+    'join task t on (t.run_id=y.run_id and t.task_id=y.task_id) '
+    '#where# '
+    'order by y.run_id,y.task_id,y.try_id '
+)
+
+## Every task with its memo status and the time the DFK decided it (first
+## 'launched' or 'memo_done' after 'pending'), for the app cache report.
+## Times are unix seconds.
+
+cacheTasks = (
+    'select t.run_id,'
+    't.task_id,'
+    't.task_func_name as appname,'
+    't.task_hashsum,'
+    't.task_memoize,'
+    't.task_depends,'
+    "max(s.task_status_name='memo_done') as memoHit,"
+    "(julianday(min(case when s.task_status_name='pending' then s.timestamp end))-2440587.5)*86400 as pending,"
+    "(julianday(min(case when s.task_status_name in ('launched','memo_done') then s.timestamp end))"
+    '-2440587.5)*86400 as decided '
+    'from task t '
+    'left join status s on (s.run_id=t.run_id and s.task_id=t.task_id) '
+    'group by t.run_id,t.task_id '
+)
+
+## Executions of each hashed task: the last try's run time.  Times are unix seconds.
+cacheRunTimes = (
+    'select t.task_hashsum,t.task_func_name as appname,'
+    '(julianday(y.task_try_time_running)-2440587.5)*86400 as running,'
+    '(julianday(y.task_try_time_returned)-julianday(y.task_try_time_running))*86400 as runTime '
+    'from try y '
+    'join task t on (t.run_id=y.run_id and t.task_id=y.task_id) '
+    'where y.task_try_time_returned is not null and y.task_try_time_running is not null '
+    'and y.try_id=(select max(z.try_id) from try z where z.run_id=y.run_id and z.task_id=y.task_id) '
+    'order by running '
+)
+
+## Percentiles reported for wait time distributions
+waitPercentiles = [50, 90, 99]
+
 
 class pmon:
     ### class pmon - read & interpret Parsl monitoring database
-    def __init__(self, dbfile='monitoring.db', debug=0):
+    def __init__(self, dbfile='monitoring.db', debug=0, readonly=False, profile=False):
         ## Instance variables
         self.dbfile = dbfile
         self.debug = debug  # [0=none,1=short(trace),2=more,3=even more,5=lengthy tables]
+        self.readonly = readonly  # True => never write to dbfile (safe on a live workflow)
+
+        ## Profiling data, {(kind,caller,label):[#calls,seconds,#rows]} and {label:query plan}
+        self.profile = profile
+        self.profData = {}
+        self.profPlans = {}
+        self.profStart = time.perf_counter()
         self.PerpDir = os.path.dirname(os.path.realpath(__file__))
 
         ## sqlite3 database initialization
-        self.con = sqlite3.connect(self.dbfile,
+        ##   In readonly mode the file is opened through a 'mode=ro' URI and
+        ##   all derived objects (temporary views, sort space) live in memory
+        dbname = self.dbfile
+        if self.readonly: dbname = f'file:{os.path.abspath(self.dbfile)}?mode=ro'
+        self.con = sqlite3.connect(dbname, uri=self.readonly,
                                    timeout=30,  ## time limit if DB locked
                                    detect_types=sqlite3.PARSE_DECLTYPES |
                                                 sqlite3.PARSE_COLNAMES)  ## special connect to sqlite3 file
         self.con.row_factory = sqlite3.Row  ## optimize output format
         self.cur = self.con.cursor()  ## create a 'cursor'
+        if self.readonly: self.cur.execute('pragma temp_store=memory')
+        self.snapshot = False  # True while a read transaction pins a consistent snapshot
 
         ## List of all tables in sqlite3 db file
         self.tableList = self.getTableList()
@@ -125,6 +271,13 @@ class pmon:
             self.storeViews()
             pass
 
+        ## From here on nothing may be written, and a snapshot is pinned so
+        ## all reports from this object agree with each other
+        if self.readonly:
+            self.cur.execute('pragma query_only=1')
+            self.beginSnapshot()
+            pass
+
         ## Load in the workflow (run) summary table
         self.wrows = None
         self.wtitles = None
@@ -151,13 +304,72 @@ class pmon:
         ## number of tasks running on them.  {nodeID:#runningTasks}
         self.nodeUsage = {}
 
+        ## Number of rows fetched per batch when streaming large result sets
+        self.streamBatch = streamBatch
+
+        ## Column store (see exportColumns/useColumns) used instead of sqlite by some reports
+        self.cols = None
+
         return
 
     def __del__(self):
-        ## Class destructor
+        ## Class destructor (__init__ may have failed before connecting)
+        if getattr(self, 'con', None) is None: return
+        if getattr(self, 'snapshot', False): self.endSnapshot()
         self.con.close()
         return
 
+    def beginSnapshot(self):
+        ## Open a read transaction so subsequent queries see one consistent
+        ## snapshot of the database.  This is only done in WAL mode, where
+        ## readers never block the writer; with a rollback journal a long
+        ## read transaction would hold a SHARED lock and stall the
+        ## MonitoringHub, so each query is left to run in its own snapshot.
+        if self.snapshot: return
+        journal = self.sqlCmd('pragma journal_mode')[0][0]
+        if journal.lower() != 'wal':
+            if self.debug > 0: print(f'journal_mode={journal}: snapshot reads need WAL, using per-query snapshots')
+            return
+        self.cur.execute('begin')
+        self.cur.execute('select count(*) from sqlite_master').fetchall()  # read starts the snapshot
+        self.snapshot = True
+        if self.debug > 0: print('Started read snapshot')
+        return
+
+    def endSnapshot(self):
+        ## Release the read snapshot, if any
+        if not self.snapshot: return
+        self.con.rollback()
+        self.snapshot = False
+        if self.debug > 0: print('Ended read snapshot')
+        return
+
+    def dataVersion(self):
+        ## sqlite's data_version: changes whenever another connection commits
+        ## to this database (only noticed outside of a read snapshot)
+        return self.cur.execute('pragma data_version').fetchone()[0]
+
+    def refresh(self):
+        ## Discard everything read from the database so far and reload the
+        ## workflow table, e.g., after dataVersion() has changed
+        if self.debug > 0: print('Entering refresh()')
+        self.resetTaskData()
+        self.nodeUsage = {}
+        self.runmin = 999999999
+        self.runmax = -1
+        self.loadWorkflowTable()
+        return
+
+    def resetTaskData(self):
+        ## Forget the task tallies and task table left by the previous report,
+        ## so the next report loads them for its own run (used by reportServer.py)
+        self.taskStats = {}
+        self.taskList = []
+        self.sumFlag = False
+        self.trows = None
+        self.ttitles = None
+        return
+
     ##########################
     ## Simple sqlite utilities
     ##########################
@@ -167,7 +379,7 @@ class pmon:
         # views = self.getTableList(type='view')
         if len(self.viewList) == 0: return False
         for view in self.neededViews:
-            if view not in views: return False
+            if view not in self.viewList: return False
         return True
 
     def getSQLfromFile(self, filename):
@@ -196,8 +408,10 @@ class pmon:
             print('Attempting to remove sqlite "views" in monitoring database')
             pass
         # views = self.getTableList(type='view')
+        ## Views stored in the file itself are left alone in readonly mode;
+        ## the temporary views below take precedence over them
         for view in self.viewList:
-            if view in self.neededView:
+            if view in self.neededViews and not self.readonly:
                 sql = f'drop view {view}'
                 self.sqlCmd(sql)
                 pass
@@ -266,8 +480,10 @@ class pmon:
     def stdQuery(self, sql):
         ## Perform a db query, fetch all results and column headers
         if self.debug > 0: print(f'Entering stdQuery({sql})')
+        t0 = time.perf_counter()
         result = self.cur.execute(sql)
         rows = result.fetchall()  # <-- This is a list of db rows in the result set
+        if self.profile: self.profQuery(sql, time.perf_counter() - t0, len(rows))
         ## This will generate a list of column headings (titles) for the result set
         titlez = result.description
         ## Convert silly 7-tuple title into a single useful value
@@ -282,17 +498,180 @@ class pmon:
             pass
         return (rows, titles)
 
+    def streamQuery(self, sql):
+        ## Perform a db query, returning column headers and a generator
+        ## which fetches result rows in batches of self.streamBatch.
+        ## A private cursor is used so other queries may run while
+        ## the result set is being consumed.
+        if self.debug > 0: print(f'Entering streamQuery({sql})')
+        cur = self.con.cursor()
+        cur.arraysize = self.streamBatch
+        t0 = time.perf_counter()
+        result = cur.execute(sql)
+        titles = [title[0] for title in result.description]
+        caller = sys._getframe(1).f_code.co_name
+        tQuery = [time.perf_counter() - t0, 0]  # [seconds spent in sqlite, #rows]
+
+        def rowGen():
+            try:
+                while True:
+                    t0 = time.perf_counter()
+                    rows = cur.fetchmany()
+                    tQuery[0] += time.perf_counter() - t0
+                    if not rows: break
+                    tQuery[1] += len(rows)
+                    for row in rows:
+                        yield row
+                        pass
+                    pass
+            finally:
+                cur.close()
+                if self.profile: self.profQuery(sql, tQuery[0], tQuery[1], caller=caller)
+            return
+
+        return (titles, rowGen())
+
+    def streamRows(self, titles, rows, fmt='fixed', out=None):
+        ## Write rows to 'out' (default stdout) as they arrive, in one of
+        ## the streamFormats.  Only one batch of rows is held in memory at
+        ## a time.  Fixed-width column sizes are taken from the titles and
+        ## the first batch; wider values in later batches are not truncated.
+        ## Returns the number of rows written.
+        if self.debug > 0: print(f'Entering streamRows({titles},fmt={fmt})')
+        if out is None: out = sys.stdout
+        if fmt not in streamFormats:
+            print(f'%ERROR: unknown stream format {fmt}, must be one of {streamFormats}')
+            sys.exit(1)
+        nRows = 0
+        batch = []
+        widths = None
+        writer = None
+        if fmt == 'csv':
+            writer = csv.writer(out)
+            writer.writerow(titles)
+            pass
+        for row in rows:
+            batch.append(row)
+            if len(batch) < self.streamBatch: continue
+            widths = self._writeBatch(titles, batch, fmt, out, writer, widths)
+            nRows += len(batch)
+            batch = []
+            pass
+        if len(batch) > 0 or widths is None:
+            self._writeBatch(titles, batch, fmt, out, writer, widths)
+            nRows += len(batch)
+            pass
+        return nRows
+
+    def _writeBatch(self, titles, batch, fmt, out, writer, widths):
+        ## Write one batch of streamed rows and flush, so the first rows
+        ## appear before the query has been fully consumed
+        if fmt == 'csv':
+            writer.writerows(batch)
+        elif fmt == 'jsonl':
+            for row in batch:
+                out.write(json.dumps(dict(zip(titles, row)), default=str) + '\n')
+                pass
+        else:
+            if widths is None:
+                widths = [len(title) for title in titles]
+                for row in batch:
+                    widths = [max(w, len(str(col))) for w, col in zip(widths, row)]
+                    pass
+                out.write('  '.join(title.ljust(w) for title, w in zip(titles, widths)) + '\n')
+                out.write('  '.join('-' * w for w in widths) + '\n')
+                pass
+            for row in batch:
+                out.write('  '.join(str(col).ljust(w) for col, w in zip(row, widths)).rstrip() + '\n')
+                pass
+            pass
+        out.flush()
+        return widths
+
     def sqlCmd(self, sql):
         ## Perform an arbitrary SQL command
         if self.debug > 0: print(f'Entering sqlCmd({sql})')
+        t0 = time.perf_counter()
         result = self.cur.execute(sql)
         rows = result.fetchall()  # <-- This is a list of db rows in the result set
+        if self.profile: self.profQuery(sql, time.perf_counter() - t0, len(rows))
         if self.debug > 0:
             print("#rows = ", len(rows))
             if self.debug > 4: print("rows = ", rows)
             pass
         return (rows)
 
+    ############
+    ## Profiling
+    ############
+
+    def profQuery(self, sql, seconds, nrows, caller=None):
+        ## Record one executed SQL statement and, once per statement, its query plan
+        if caller is None: caller = sys._getframe(2).f_code.co_name
+        label = ' '.join(sql.split())
+        key = ('sql', caller, label)
+        stats = self.profData.setdefault(key, [0, 0.0, 0])
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] += nrows
+        if label not in self.profPlans and label.lower().startswith(('select', 'with')):
+            plan = self.con.execute('explain query plan ' + sql).fetchall()
+            depth = {0: -1}
+            lines = []
+            for (id, parent, notused, detail) in plan:
+                depth[id] = depth.get(parent, -1) + 1
+                lines.append('  ' * depth[id] + detail)
+                pass
+            self.profPlans[label] = lines
+            pass
+        return
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        ## Time a block of Python post-processing when profiling, e.g.
+        ##   with self.stage('format task summary'): ...
+        if not self.profile:
+            yield
+            return
+        caller = sys._getframe(2).f_code.co_name
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats = self.profData.setdefault(('python', caller, name), [0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += time.perf_counter() - t0
+            pass
+        return
+
+    def printProfile(self, nplans=5, out=None):
+        ## Print the ranked hot-spot table of SQL statements and Python stages,
+        ## followed by the query plans of the slowest statements
+        if out is None: out = sys.stdout
+        total = time.perf_counter() - self.profStart
+        ranked = sorted(self.profData.items(), key=lambda item: item[1][1], reverse=True)
+        rows = []
+        for rank, ((kind, caller, label), (calls, seconds, nrows)) in enumerate(ranked, start=1):
+            if len(label) > 70: label = label[:67] + '...'
+            rows.append([rank, kind, caller, label, calls, seconds, 100. * seconds / total,
+                         nrows if kind == 'sql' else None])
+            pass
+        print(f'\nProfile of {self.dbfile}: {total:.3f} s since pmon was created', file=out)
+        print(tabulate(rows, headers=['rank', 'kind', 'caller', 'statement/stage', 'calls', 'seconds', '%',
+                                      'rows'],
+                       tablefmt=tblfmt, floatfmt='.3f', missingval=''), file=out)
+        n = 0
+        for ((kind, caller, label), stats) in ranked:
+            if kind != 'sql' or label not in self.profPlans: continue
+            n += 1
+            if n > nplans: break
+            print(f'\nQuery plan #{n} ({caller}, {stats[1]:.3f} s): {label}', file=out)
+            for line in self.profPlans[label]:
+                print('   ' + line, file=out)
+                pass
+            pass
+        return
+
     ######################################
     ## Parsl monitoring analysis functions
     ######################################
@@ -322,15 +701,16 @@ class pmon:
         (self.wrows, self.wtitles) = self.stdQuery(sql)
         self.runid2num = {}
         self.runnum2id = {}
-        for row in self.wrows:
-            runID = row['run_id']
-            runnum = row['runnum']
-            # runDir = os.path.basename(row['rundir'])   ## "runDir" is defined by the runinfo/NNN directory
-            self.runid2num[runID] = runnum
-            self.runnum2id[int(runnum)] = runID
-            if int(runnum) > self.runmax: self.runmax = int(runnum)
-            if int(runnum) < self.runmin: self.runmin = int(runnum)
-            pass
+        with self.stage('index runs'):
+            for row in self.wrows:
+                runID = row['run_id']
+                runnum = row['runnum']
+                # runDir = os.path.basename(row['rundir'])   ## "runDir" is defined by the runinfo/NNN directory
+                self.runid2num[runID] = runnum
+                self.runnum2id[int(runnum)] = runID
+                if int(runnum) > self.runmax: self.runmax = int(runnum)
+                if int(runnum) < self.runmin: self.runmin = int(runnum)
+                pass
         self.numRuns = len(self.wrows)
         if self.debug > 1:
             print('numRuns   = ', self.numRuns)
@@ -405,7 +785,8 @@ class pmon:
         wSummaryList.append(['workflow user', row['user'] + '@' + row['host']])
         wSummaryList.append(['workflow rundir', exeDir])
         wSummaryList.append(['MonitorDB', self.dbfile])
-        print(tabulate(wSummaryList, tablefmt=tblfmt))
+        with self.stage('tabulate output'):
+            print(tabulate(wSummaryList, tablefmt=tblfmt))
         return
 
     def selectRunID(self, runnum=None):
@@ -443,27 +824,54 @@ class pmon:
         nTasks = 0
         statTotals = dict(self.statTemplate)  # bottom row = vertical totals
         statTotals['TOTAL'] = 0
-        for task in self.trows:
-            nTasks += 1
-            tName = task[tNameIndx]
-            tStat = task[tStatIndx]
+        with self.stage('tally task states'):
+            for task in self.trows:
+                nTasks += 1
+                tName = task[tNameIndx]
+                tStat = task[tStatIndx]
+                if tName not in self.taskStats.keys():
+                    nTaskTypes += 1
+                    self.taskStats[tName] = dict(self.statTemplate)
+                    self.taskStats[tName]['TOTAL'] = 0
+                    pass
+                self.taskStats[tName][tStat] += 1
+                self.taskStats[tName]['TOTAL'] += 1
+                statTotals[tStat] += 1
+                statTotals['TOTAL'] += 1
+                pass
+        self.taskStats['TOTAL'] = dict(statTotals)
+        self.taskList = list(self.taskStats.keys())[:-1]
+        self.sumFlag = True
+        return
+
+    def tallyTaskData(self, where=''):
+        ## Tally status for each task type within the database, without
+        ## loading the task summary rows (used when streaming output)
+        ##  Store -> taskStats{} (same layout as loadTaskData)
+        if self.debug > 0: print(f'Entering tallyTaskData({where})')
+        sql = (f"select appname,status,count(*) as num from summary {where} "
+               f"group by appname,status order by min(tasknum)")
+        rows = self.sqlCmd(sql)
+        statTotals = dict(self.statTemplate)  # bottom row = vertical totals
+        statTotals['TOTAL'] = 0
+        for (tName, tStat, num) in rows:
             if tName not in self.taskStats.keys():
-                nTaskTypes += 1
                 self.taskStats[tName] = dict(self.statTemplate)
                 self.taskStats[tName]['TOTAL'] = 0
                 pass
-            self.taskStats[tName][tStat] += 1
-            self.taskStats[tName]['TOTAL'] += 1
-            statTotals[tStat] += 1
-            statTotals['TOTAL'] += 1
+            self.taskStats[tName][tStat] += num
+            self.taskStats[tName]['TOTAL'] += num
+            statTotals[tStat] += num
+            statTotals['TOTAL'] += num
             pass
         self.taskStats['TOTAL'] = dict(statTotals)
         self.taskList = list(self.taskStats.keys())[:-1]
         self.sumFlag = True
         return
 
-    def taskStatusMatrix(self, runnum=None):
+    def taskStatusMatrix(self, runnum=None, tally=False):
         ## print matrix of task function name vs Parsl state
+        ##   tally=True counts states in the database rather than loading all task rows
         if self.debug > 0: print('Entering taskStatusMatrix')
 
         runTxt = ' for all runs'
@@ -472,32 +880,37 @@ class pmon:
             where = f'where runnum={runnum} '
             runTxt = f' for run {runnum}'
             pass
-        if not self.sumFlag: self.loadTaskData(where=where)
-        if len(self.trows) < 1:
+        if not self.sumFlag:
+            if tally:
+                self.tallyTaskData(where=where)
+            else:
+                self.loadTaskData(where=where)
+                pass
+            pass
+        if self.taskStats['TOTAL']['TOTAL'] < 1:
             print('No tasks to summarize')
             return
 
-        ## Convert statistics data into a Pandas dataframe
-        ##    [Defining a pandas dataframe]
-        ##    df = pandas.DataFrame(columns=['a','b','c','d'], index=['x','y','z'])
-        ##    df.loc['y'] = pandas.Series({'a':1, 'b':5, 'c':2, 'd':3})
-        pTaskStats = pd.DataFrame(columns=list(self.statTemplate.keys()) + ['TOTAL'],
-                                  index=self.taskStats.keys())
+        ## One row per task type: [appname,#state1,#state2,...,TOTAL]
+        statCols = list(self.statTemplate.keys()) + ['TOTAL']
+        pTaskStats = []
         for task in self.taskStats:
-            pTaskStats.loc[task] = pd.Series(self.taskStats[task])
+            pTaskStats.append([task] + [self.taskStats[task][col] for col in statCols])
             pass
 
         print(f'\nTask status matrix{runTxt}:')
-        print(tabulate(pTaskStats, headers='keys', tablefmt=tblfmt))
+        with self.stage('tabulate output'):
+            print(tabulate(pTaskStats, headers=[''] + statCols, tablefmt=tblfmt))
         return
 
     def taskSum(self, runnum=None, tasknum=None, taskid=None, taskname=None, status=None,
-                limit=None, extendedCols=False, oddball=False):
+                limit=None, extendedCols=False, oddball=False, stream=None):
         # Prepare and print out a summary of all (selected) tasks for this workflow
+        #   stream=<one of streamFormats> writes rows incrementally instead of via tabulate
         if self.debug > 0:
             print("Entering taskSum")
             print(f'runnum={runnum},tasknum={tasknum},taskid={taskid},taskname={taskname},'
-                  f'status={status},limit={limit},extendedCols={extendedCols}')
+                  f'status={status},limit={limit},extendedCols={extendedCols},stream={stream}')
             pass
 
         # Prepare list of variables (columns) to request, regular or extended
@@ -516,6 +929,22 @@ class pmon:
         if status != None: whereList.append(f' status="{status}" ')
         if len(whereList) > 0: where = 'where ' + ' and '.join(whereList)
 
+        # Stream data from DB
+        if stream != None:
+            sql = f'select {what} from summary {where}'
+            if limit != None and limit != 0: sql += f' limit {limit}'
+            (titles, rows) = self.streamQuery(sql)
+            if stream == 'fixed': print(f'Most recent status for selected cached tasks (print limit = {limit})')
+            nRows = self.streamRows(titles, rows, fmt=stream)
+            if stream == 'fixed':
+                print(f'(# tasks selected = {nRows})')
+                if oddball:
+                    self.ndtaskSummary(runnum=runnum, taskname=taskname)
+                    self.nctaskSummary(runnum=runnum)
+                    pass
+                pass
+            return
+
         # Fetch data from DB
         self.loadTaskData(what=what, where=where)
         rows = self.trows
@@ -529,7 +958,8 @@ class pmon:
         if len(rows) > 0:
             print(
                 f'Most recent status for selected cached tasks (# tasks selected = {len(rows)}, print limit = {last})')
-            print(tabulate(rows[0:last], headers=titles, tablefmt=tblfmt))
+            with self.stage('tabulate output'):
+                print(tabulate(rows[0:last], headers=titles, tablefmt=tblfmt))
         else:
             print(f'No ordinary cached tasks have been selected for display')
             pass
@@ -552,7 +982,8 @@ class pmon:
         (rows, titles) = self.stdQuery(sql)
         if len(rows) > 0:
             print(f'List of most recent invocation of all {len(rows)} non-cached tasks {runtxt}')
-            print(tabulate(rows, headers=titles, tablefmt=tblfmt))
+            with self.stage('tabulate output'):
+                print(tabulate(rows, headers=titles, tablefmt=tblfmt))
         else:
             print('There are no non-cached tasks to report.')
             pass
@@ -578,16 +1009,19 @@ class pmon:
         (rows, titles) = self.stdQuery(sql)
         if len(rows) > 0:
             print(f'List of {len(rows)} non-dispatched cached tasks {runtxt}')
-            print(tabulate(rows, headers=titles, tablefmt=tblfmt))
+            with self.stage('tabulate output'):
+                print(tabulate(rows, headers=titles, tablefmt=tblfmt))
         else:
             print('There are no non-dispatched cached tasks to report.')
         return
 
-    def taskHis(self, runnum=None, tasknum=None, taskid=None, taskname=None, status=None, limit=None):
+    def taskHis(self, runnum=None, tasknum=None, taskid=None, taskname=None, status=None, limit=None,
+                stream=None):
         # Print out the full history for a single, specified task in this workflow
+        #   stream=<one of streamFormats> writes rows incrementally instead of via tabulate
         if self.debug > 0:
             print(f'Entering taskHis(runnum={runnum},tasknum={tasknum},taskid={taskid},'
-                  f'taskname={taskname},status={status},limit={limit}')
+                  f'taskname={taskname},status={status},limit={limit},stream={stream}')
             pass
         if taskname == None and tasknum == None and (taskid == None or runnum == None):
             print(
@@ -612,11 +1046,22 @@ class pmon:
         # sql = taskHistoryQuery.replace('#tasknum#',f'{tasknum}')
         sql = taskHistoryQuery
         sql = sql.replace('#morewhere#', morewhere)
+
+        # Stream data from DB
+        if stream != None:
+            if limit != None and limit != 0: sql += f' limit {limit}'
+            (titles, rows) = self.streamQuery(sql)
+            if stream == 'fixed': print(f'Full history of task {tasknum}')
+            nRows = self.streamRows(titles, rows, fmt=stream)
+            if stream == 'fixed': print(f'({nRows} state changes)')
+            return
+
         (rows, titles) = self.stdQuery(sql)
 
         # Pretty print
         print(f'Full history of task {tasknum}, containing {len(rows)} state changes')
-        print(tabulate(rows, headers=titles, tablefmt=tblfmt))
+        with self.stage('tabulate output'):
+            print(tabulate(rows, headers=titles, tablefmt=tblfmt))
         return
 
     def runStats(self):
@@ -627,24 +1072,28 @@ class pmon:
 
         statsTitles = ['appname', '#(re)tries', 'waitTime', 'runTime', 'elapsedTime']
         stats = []
-        for crow in crows:
-            stats.append([crow[1], crow[2], crow[6], crow[7], crow[8]])
-            pass
+        with self.stage('collect app statistics'):
+            for crow in crows:
+                stats.append([crow[1], crow[2], crow[6], crow[7], crow[8]])
+                pass
 
         ## print and return
         print(f'Accumulated run statistics for all {len(crows)} app types (includes any retries). Time in minutes.')
-        print(tabulate(stats, headers=statsTitles, tablefmt=tblfmt))
+        with self.stage('tabulate output'):
+            print(tabulate(stats, headers=statsTitles, tablefmt=tblfmt))
 
         return
 
-    def makePlots(self):
-        ## Produce various plots
-        if self.debug > 0: print('Entering makePlots()')
+    def makePlots(self, show=False, nproc=None, pageSize=None):
+        ## Produce histograms of task waitTime, runTime and elapsedTime per app
+        ##   Data are binned with numpy in a single pass over the query result,
+        ##   then each canvas (one per metric and page of apps) is rendered off
+        ##   screen in a pool of nproc worker processes and saved as a jpg.
+        ##   show=True displays the saved canvases afterwards.
+        if self.debug > 0: print(f'Entering makePlots(show={show},nproc={nproc},pageSize={pageSize})')
+        import numpy as np
         histList = ['waitTime', 'runTime', 'elapsedTime']
-
-        ## Load generic task data
-        self.loadTaskData()
-        print(f'There are {len(self.taskList)} task types in this workflow: {self.taskList}')
+        if pageSize is None: pageSize = plotPageSize
 
         ## Query timing data from monitoring database.
         ## [tasknum,appname,numTries,launchTime,startTime,endTime,waitTime,runTime,elapsedTime]
@@ -654,60 +1103,70 @@ class pmon:
         sql1 = plotStats.replace('#groupby#', 'tv.task_hashsum')
         (trows, ttitles) = self.stdQuery(sql1)
 
-        for h in histList:
-            hx = ttitles.index(h)
-            if self.debug > 0: print(f'h={h}, hx={hx}')
-
-            ## Organize data for plotting
-            ## Time interval data is represented as minutes
-            hists = {}  # {<appname>:[datum1,datum2,...]}
-
-            nhists = len(self.taskList)
-            for task in self.taskList:
-                hists[task] = []  # initialize histogram data
+        ## One pass over the result set: app index and time intervals (minutes) per task
+        appIndex = {}  # {<appname>:index}, in order of first invocation
+        codes = np.empty(len(trows), dtype=np.int64)
+        data = np.empty((len(histList), len(trows)), dtype=np.float64)
+        hxs = [ttitles.index(h) for h in histList]
+        with self.stage('load plot data'):
+            for i, trow in enumerate(trows):
+                codes[i] = appIndex.setdefault(trow[1], len(appIndex))
+                data[:, i] = [np.nan if trow[hx] is None else trow[hx] for hx in hxs]
                 pass
-            for trow in trows:
-                if trow[hx] is not None: hists[trow[1]].append(trow[hx])  # fill hist list of runTime
+        taskList = list(appIndex.keys())
+        print(f'There are {len(taskList)} task types in this workflow: {taskList}')
+        if len(taskList) == 0: return
+
+        ## Group tasks by app once, then bin each app's slice for every metric
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(taskList) + 1))
+        jobs = []
+        with self.stage('bin histograms'):
+            for h, hdata in zip(histList, data):
+                hists = []  # [(appname,counts,edges)]
+                for k, taskType in enumerate(taskList):
+                    values = hdata[order[bounds[k]:bounds[k + 1]]]
+                    values = values[~np.isnan(values)]
+                    (counts, edges) = np.histogram(values, bins=10)
+                    hists.append((taskType, counts, edges))
+                    if self.debug > 1: print(f'===> {taskType}[{len(values)}] : {counts}')
+                    pass
 
-            if self.debug > 1:
-                for k in hists:
-                    print(f'===> {k}[{len(hists[k])}] : {hists[k]}')
+                ## Paginate canvases so thousands of app types stay readable
+                npages = (len(hists) + pageSize - 1) // pageSize
+                for page in range(npages):
+                    fname = f'plots-{h}.jpg'
+                    title = f'Task {h}s'
+                    if npages > 1:
+                        fname = f'plots-{h}-{page + 1:03d}.jpg'
+                        title += f' (page {page + 1} of {npages})'
+                        pass
+                    jobs.append((title, h, fname, hists[page * pageSize:(page + 1) * pageSize]))
                     pass
                 pass
 
-            ## Prepare plotting canvas (a grid of up to 4 cols x N rows)
-            ncols = 4
-            if nhists <= ncols: ncols = nhists
-            if nhists % ncols == 0:
-                nrows = int(nhists / ncols)
+        ## Render canvases in parallel
+        if nproc is None: nproc = multiprocessing.cpu_count()
+        nproc = max(1, min(nproc, len(jobs)))
+        if self.debug > 0: print(f'Rendering {len(jobs)} canvases with {nproc} processes')
+        with self.stage('render plots'):
+            if nproc > 1:
+                with multiprocessing.Pool(nproc) as pool:
+                    files = pool.map(renderHistPage, jobs)
+                    pass
             else:
-                nrows = 1 + int(nhists / ncols)
-                pass
-            fig = plt.figure(figsize=(11, 8.5), tight_layout=True)  ## Establish canvas
-            plt.suptitle(f'Task {ttitles[hx]}s')  ## define plot title (before making plots)
-            nhist = 1
-            if self.debug > 0: print(f'nhists={nhists}:  nrows={nrows}, ncols={ncols}')
-
-            ## Fill matplotlib histograms
-            for taskType in self.taskList:
-                row = int((nhist - 1) / ncols)  # row of plot on canvas
-                col = (nhist - 1) % ncols  # col of plot on canvas
-                if self.debug > 0: print(f'{taskType} [{len(hists[taskType])}]: nhist {nhist}, row {row}, col {col}')
-                x = fig.add_subplot(nrows, ncols, nhist)  # create a spot for the histogram
-                # x = plt.subplot(nrows,ncols,nhist)  # alternative to fig.add_subplot()
-                x.hist(hists[taskType])  # hand histo data to matplotlib
-                # n, bins, patches = x.hist(hists[taskType])  # in case you want the binned data
-
-                #  Use, e.g., r' ... $\sigma$ ...' strings for greek (in matplotlib only)
-                x.set_xlabel(f'{ttitles[hx]} in minutes')
-                x.set_ylabel(f'# tasks')
-                x.set_title(fr'{taskType}')
-                # x.set_title(fr'{nhist}[{row},{col}] {taskType}')
-                nhist += 1
-                pass
-
-            # Display plots
-            plt.savefig(f'plots-{ttitles[hx]}.jpg')
+                files = [renderHistPage(job) for job in jobs]
+                pass
+        print(f'Plots saved to {files}')
+
+        # Display plots
+        if show:
+            import matplotlib.pyplot as plt
+            for fname in files:
+                plt.figure(figsize=(11, 8.5))
+                plt.imshow(plt.imread(fname))
+                plt.axis('off')
+                pass
             plt.show()
             pass
         return
@@ -729,12 +1188,800 @@ class pmon:
         (rows, titles) = self.stdQuery(sql)
         # Pretty print
         print(f'\nBatch job summary table {msg}')
-        print(tabulate(rows, headers=titles, tablefmt=tblfmt))
+        with self.stage('tabulate output'):
+            print(tabulate(rows, headers=titles, tablefmt=tblfmt))
+        return
+
+    def loadTryTimes(self, runnum=None):
+        ## Load every try (of one run, or all runs) as numpy arrays:
+        ##   {'runnum','appname','hostname','launched','running','returned'}
+        ##   Times are unix seconds, NaN if not (yet) reached.  Data are read
+        ##   from the column store when one is in use (see useColumns).
+        if self.debug > 0: print(f'Entering loadTryTimes(runnum={runnum})')
+        import numpy as np
+        if self.cols is not None: return self.cols.tryTimes(runnum)
+        where = ''
+        if runnum != None: where = f"where y.run_id='{self.runnum2id[runnum]}'"
+        rows = self.sqlCmd(tryTimes.replace('#where#', where))
+        with self.stage('load try times'):
+            tries = {'runnum': np.array([self.runid2num[row[0]] for row in rows], dtype=np.int64),
+                     'appname': np.array([row[1] for row in rows], dtype=object),
+                     'hostname': np.array([row[2] for row in rows], dtype=object)}
+            for k, col in enumerate(['launched', 'running', 'returned']):
+                tries[col] = np.array([row[3 + k] for row in rows], dtype=np.float64)
+                pass
+            pass
+        return tries
+
+    def loadResourceStats(self, runnum=None):
+        ## Per-try resource usage (see resourceStats) as a pandas DataFrame,
+        ## from sqlite or from the column store when one is in use
+        if self.debug > 0: print(f'Entering loadResourceStats(runnum={runnum})')
+        import pandas as pd
+        runID = None
+        if runnum != None: runID = self.runnum2id[runnum]
+        if self.cols is not None: return pd.DataFrame(self.cols.resourceStats(runID))
+        where = ''
+        if runID != None: where = f"where run_id='{runID}'"
+        sql = resourceStats.replace('#where#', where)
+        t0 = time.perf_counter()
+        df = pd.read_sql_query(sql, self.con)
+        if self.profile: self.profQuery(sql, time.perf_counter() - t0, len(df))
+        return df
+
+    def exportColumns(self, dest=None, tables=None):
+        ## Export monitoring tables to typed, memory-mappable column files
+        ##   dest/<table>/<column>.npy, plus dest/manifest.json
+        ##   DATETIME  -> int64 microseconds since the epoch (colNull if NULL)
+        ##   INTEGER   -> int64 (float64 if the column has NULLs)
+        ##   FLOAT     -> float64 (NaN if NULL)
+        ##   other     -> int32 codes (-1 if NULL) into <column>.dict.json
+        ##   Tables with a run_id also get an int32 'runnum' column.
+        if dest is None: dest = os.path.splitext(self.dbfile)[0] + '.cols'
+        if tables is None: tables = colTables
+        if self.debug > 0: print(f'Entering exportColumns(dest={dest},tables={tables})')
+        import numpy as np
+        os.makedirs(dest, exist_ok=True)
+        manifest = {'source': os.path.abspath(self.dbfile), 'sourceSize': os.path.getsize(self.dbfile),
+                    'sourceMtime': os.path.getmtime(self.dbfile), 'tables': {}}
+        cur = self.con.cursor()
+        cur.row_factory = None
+        cur.arraysize = 100000
+        for table in tables:
+            if table not in self.tableList: continue
+            with self.stage(f'export {table}'):
+                tdir = os.path.join(dest, table)
+                os.makedirs(tdir, exist_ok=True)
+                ## Rows are bounded by the largest rowid seen now, so that rows the
+                ## MonitoringHub inserts while the table is exported (possible
+                ## outside WAL mode, where no snapshot is pinned) are left out of
+                ## every query below
+                (nrows, maxRowid) = self.sqlCmd(f'select count(*),max(rowid) from "{table}"')[0]
+                if maxRowid is None: maxRowid = 0
+                bound = f'where rowid <= {int(maxRowid)}'
+                columns = []  # [(name,kind,sql expression)]
+                for info in self.sqlCmd(f'pragma table_info("{table}")'):
+                    (name, decl) = (info[1], (info[2] or '').upper())
+                    if 'DATE' in decl or 'TIME' in decl:
+                        columns.append((name, 'datetime', f"strftime('%s',\"{name}\")*1000000"
+                                                          f"+cast(substr(\"{name}\"||'000000',21,6) as integer)"))
+                    elif 'INT' in decl or 'BOOL' in decl:
+                        nulls = self.sqlCmd(f'select count(*)-count("{name}") from "{table}" {bound}')[0][0]
+                        columns.append((name, 'int' if nulls == 0 else 'float', f'"{name}"'))
+                    elif 'FLOAT' in decl or 'REAL' in decl or 'DOUBLE' in decl:
+                        columns.append((name, 'float', f'"{name}"'))
+                    else:
+                        columns.append((name, 'text', f'"{name}"'))
+                        pass
+                    pass
+
+                ## Fill the column files batch by batch, so memory use is bounded
+                arrays = {}
+                dicts = {}
+                for (name, kind, expr) in columns:
+                    dtype = {'datetime': np.int64, 'int': np.int64, 'float': np.float64, 'text': np.int32}[kind]
+                    arrays[name] = np.lib.format.open_memmap(os.path.join(tdir, f'{name}.npy'), mode='w+',
+                                                             dtype=dtype, shape=(nrows,))
+                    if kind == 'text': dicts[name] = {}
+                    pass
+                cur.execute(f'select {",".join(c[2] for c in columns)} from "{table}" {bound}')
+                i0 = 0
+                while True:
+                    rows = cur.fetchmany()
+                    if not rows: break
+                    i1 = i0 + len(rows)
+                    for j, (name, kind, expr) in enumerate(columns):
+                        vals = [row[j] for row in rows]
+                        if kind == 'text':
+                            codes = dicts[name]
+                            vals = [-1 if v is None else codes.setdefault(v, len(codes)) for v in vals]
+                        elif kind == 'datetime':
+                            vals = [colNull if v is None else v for v in vals]
+                            pass
+                        arrays[name][i0:i1] = vals
+                        pass
+                    i0 = i1
+                    pass
+                for name in arrays: arrays[name].flush()
+                if i0 < nrows:
+                    ## Rows were deleted meanwhile: keep only those read
+                    print(f'%WARNING: {table} lost {nrows - i0} rows during export')
+                    for name in arrays:
+                        values = np.array(arrays[name][:i0])
+                        arrays[name] = None
+                        np.save(os.path.join(tdir, f'{name}.npy'), values)
+                        arrays[name] = values
+                        pass
+                    nrows = i0
+                    pass
+                for name in dicts:
+                    with open(os.path.join(tdir, f'{name}.dict.json'), 'w') as f:
+                        json.dump(list(dicts[name]), f)
+                        pass
+                    pass
+
+                ## Global run numbers, as in runview
+                kinds = {name: kind for (name, kind, expr) in columns}
+                if 'run_id' in dicts:
+                    lookup = np.array([self.runid2num.get(runID, -1) for runID in dicts['run_id']] + [-1],
+                                      dtype=np.int32)
+                    np.save(os.path.join(tdir, 'runnum.npy'), lookup[arrays['run_id']])
+                    kinds['runnum'] = 'int'
+                    pass
+                manifest['tables'][table] = {'rows': nrows, 'columns': kinds}
+                del arrays
+                pass
+            print(f'Exported {table}: {nrows} rows, {len(columns)} columns')
+            pass
+        with open(os.path.join(dest, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=1)
+            pass
+        print(f'Column store written to {dest}')
+        return dest
+
+    def useColumns(self, path):
+        ## Read try, workflow and resource data from a column store
+        ## (see exportColumns) instead of sqlite
+        if self.debug > 0: print(f'Entering useColumns({path})')
+        self.cols = colstore(path)
+        if self.cols.isStale():
+            print(f'%WARNING: {self.dbfile} has changed since the column store {path} was exported')
+            pass
+        return
+
+    def getRunTimes(self, runnum):
+        ## (began, completed) of one run in unix seconds; completed is None while running
+        if self.cols is not None: return self.cols.runTimes(self.runnum2id[runnum])
+        return tuple(self.sqlCmd(f"select (julianday(time_began)-2440587.5)*86400,"
+                                 f"(julianday(time_completed)-2440587.5)*86400 "
+                                 f"from workflow where run_id='{self.runnum2id[runnum]}'")[0])
+
+    def getNodeInfo(self):
+        ## Workers and cores per run from the 'node' table,
+        ## {run_id:(#workers,#cores,coresPerWorker)}.  Runs without node
+        ## data are absent.
+        if self.debug > 0: print('Entering getNodeInfo()')
+        nodeInfo = {}
+        if 'node' not in self.tableList: return nodeInfo
+        for (runID, workers, cpus) in self.sqlCmd(multiNodeQuery):
+            cpw = None
+            if workers and cpus: cpw = cpus / workers
+            nodeInfo[runID] = (workers, cpus, cpw)
+            pass
+        return nodeInfo
+
+    def resourceReport(self, runnum=None, cpw=None, idleFraction=0.5):
+        ## Per-app CPU utilization, peak memory and I/O from the 'resource' table
+        ##   utilization = CPU seconds / (cores per worker x runTime)
+        ##   Cores per worker come from the 'node' table unless cpw is given.
+        ##   Apps using less than idleFraction of their allocated cores are flagged.
+        if self.debug > 0: print(f'Entering resourceReport(runnum={runnum},cpw={cpw},idleFraction={idleFraction})')
+        import pandas as pd
+
+        where = ''
+        runTxt = 'all runs'
+        if runnum != None:
+            where = f"where run_id='{self.runnum2id[runnum]}'"
+            runTxt = f'run {runnum}'
+            pass
+        df = self.loadResourceStats(runnum)
+        if len(df) == 0:
+            print(f'No resource monitoring data for {runTxt}')
+            return
+
+        with self.stage('aggregate resource usage'):
+            ## Allocated cores per try
+            if cpw is None:
+                nodeInfo = self.getNodeInfo()
+                df['cores'] = df['run_id'].map({runID: info[2] for runID, info in nodeInfo.items()})
+                df['cores'] = df['cores'].fillna(1.0)
+            else:
+                df['cores'] = cpw
+                pass
+            df['runnum'] = df['run_id'].map(self.runid2num)
+            df['allocated'] = df['cores'] * df['runTime'].clip(lower=0)
+
+            ## Per-app totals
+            apps = df.groupby('appname', sort=False).agg(
+                tries=('try_id', 'size'),
+                samples=('samples', 'sum'),
+                cores=('cores', 'mean'),
+                runTime=('runTime', 'sum'),
+                cpuTime=('cpuTime', 'sum'),
+                allocated=('allocated', 'sum'),
+                peakRSS=('peakRSS', 'max'),
+                readBytes=('readBytes', 'sum'),
+                writeBytes=('writeBytes', 'sum'))
+            apps['utilization'] = apps['cpuTime'] / apps['allocated'].where(apps['allocated'] > 0)
+            apps['flag'] = ''
+            apps.loc[apps['utilization'] < idleFraction, 'flag'] = 'IDLE CORES'
+            apps = apps.sort_values('utilization')
+
+            rows = []
+            for app, a in apps.iterrows():
+                rows.append([app, a['tries'], a['samples'], a['cores'], a['runTime'], a['cpuTime'],
+                             100. * a['utilization'], a['peakRSS'] / 2 ** 20,
+                             a['readBytes'] / 2 ** 20, a['writeBytes'] / 2 ** 20, a['flag']])
+                pass
+            pass
+
+        print(f'\nCPU and memory efficiency per app for {runTxt} ({len(df)} monitored tries). '
+              f'Time in seconds, memory and I/O in MiB.')
+        with self.stage('tabulate output'):
+            print(tabulate(rows, headers=['appname', '#tries', '#samples', 'cores/worker', 'runTime', 'cpuTime',
+                                          'cpu util %', 'peak RSS', 'read', 'written', ''],
+                           tablefmt=tblfmt, floatfmt='.2f', missingval='?'))
+        nIdle = int((apps['flag'] != '').sum())
+        if nIdle > 0:
+            print(f'{nIdle} app(s) used less than {100 * idleFraction:.0f}% of their allocated cores')
+            pass
+        return
+
+    def workerReport(self, runnum=None, limit=None):
+        ## Worker utilization and scheduling gaps for one run (default = latest)
+        ##   Each host's tries are packed into worker 'lanes' (see assignLanes),
+        ##   then every worker's busy time and the idle gaps before, between and
+        ##   after its tasks are totalled.  Workers reported in the 'node' table
+        ##   that never ran a task count as idle for the whole run.
+        if self.debug > 0: print(f'Entering workerReport(runnum={runnum},limit={limit})')
+        import numpy as np
+        if runnum == None: runnum = self.runmax
+        runID = self.runnum2id[runnum]
+        tries = self.loadTryTimes(runnum)
+        done = ~np.isnan(tries['running']) & ~np.isnan(tries['returned'])
+        if not np.any(done):
+            print(f'No completed tries in run {runnum}')
+            return
+
+        ## Run wall time is from workflow start to completion (or the last return, if still running)
+        (began, completed) = self.getRunTimes(runnum)
+        with self.stage('rebuild worker lanes'):
+            hosts = tries['hostname'][done]
+            starts = tries['running'][done]
+            ends = tries['returned'][done]
+            if completed is None: completed = ends.max()
+            lanes = assignLanes(hosts, starts, ends)
+            workers = workerStats(hosts, lanes, starts, ends, began, completed)
+            pass
+
+        ## Pad with workers that never received a task
+        nodeInfo = self.getNodeInfo().get(runID)
+        nWorkers = len(workers)
+        if nodeInfo is not None and nodeInfo[0] is not None and nodeInfo[0] > nWorkers: nWorkers = nodeInfo[0]
+        wall = completed - began
+        nIdle = nWorkers - len(workers)
+
+        rows = []
+        for w in workers[:limit]:
+            rows.append([w['host'], w['worker'], w['tasks'], w['busy'], 100. * w['busy'] / wall,
+                         w['lead'], w['ngaps'], w['gaps'], w['maxgap'], w['tail']])
+            pass
+        print(f'\nWorker utilization for run {runnum}: {nWorkers} workers ({nIdle} never used), '
+              f'wall time {wall:.2f} s. Time in seconds.')
+        with self.stage('tabulate output'):
+            print(tabulate(rows, headers=['host', 'worker', '#tasks', 'busy', 'busy %', 'startup idle', '#gaps',
+                                          'gap total', 'max gap', 'drain idle'],
+                           tablefmt=tblfmt, floatfmt='.2f'))
+
+        ## Where the core-seconds go: EEPS cost = wall time x workers
+        cost = wall * nWorkers
+        busy = sum(w['busy'] for w in workers)
+        lead = sum(w['lead'] for w in workers)
+        gaps = sum(w['gaps'] for w in workers)
+        tail = sum(w['tail'] for w in workers)
+        unused = wall * nIdle
+        rows = [['busy (tasks running)', busy, 100. * busy / cost],
+                ['idle before first task', lead, 100. * lead / cost],
+                ['idle between tasks', gaps, 100. * gaps / cost],
+                ['idle after last task', tail, 100. * tail / cost],
+                ['workers never used', unused, 100. * unused / cost],
+                ['total (wall x workers)', cost, 100.]]
+        print(f'\nBreakdown of {cost:.2f} worker-seconds in run {runnum}')
+        print(tabulate(rows, headers=['', 'worker-seconds', '%'], tablefmt=tblfmt, floatfmt='.2f'))
+        return
+
+    def timeline(self, runnum=None, outfile=None, width=1600, height=900):
+        ## Gantt-style timeline of one run (default = latest): one row per
+        ## worker lane (see assignLanes), tries colored by app.  Tries are
+        ## painted into a grid of at most width x height pixels, so drawing
+        ## time and file size stay bounded however many tries the run has.
+        ## outfile may be an image (.png, .jpg, .svg, ...) or a self-contained .html.
+        if self.debug > 0: print(f'Entering timeline(runnum={runnum},outfile={outfile})')
+        import numpy as np
+        if runnum == None: runnum = self.runmax
+        if outfile is None: outfile = f'timeline-{runnum}.png'
+        tries = self.loadTryTimes(runnum)
+        done = ~np.isnan(tries['running']) & ~np.isnan(tries['returned'])
+        if not np.any(done):
+            print(f'No completed tries in run {runnum}')
+            return
+        (began, completed) = self.getRunTimes(runnum)
+        hosts = tries['hostname'][done]
+        starts = tries['running'][done]
+        ends = tries['returned'][done]
+        if completed is None: completed = ends.max()
+        wall = max(completed - began, 1e-6)
+
+        with self.stage('paint timeline'):
+            ## One row per (host, lane); rows are merged if there are more lanes than pixels
+            lanes = assignLanes(hosts, starts, ends)
+            (laneKeys, rowOf) = np.unique(np.array([f'{h}\0{l:06d}' for h, l in zip(hosts, lanes)]),
+                                          return_inverse=True)
+            nLanes = len(laneKeys)
+            nrows = min(nLanes, height)
+            rows = rowOf * nrows // nLanes
+            (apps, codes) = np.unique(tries['appname'][done].astype(str), return_inverse=True)
+
+            ## Pixel span of each try: [p0,p1), at least one pixel wide
+            p0 = np.clip(((starts - began) / wall * width).astype(np.int64), 0, width - 1)
+            p1 = np.clip(np.ceil((ends - began) / wall * width).astype(np.int64), p0 + 1, width)
+            spans = p1 - p0
+            pix = np.repeat(p0 - np.cumsum(spans) + spans, spans) + np.arange(spans.sum())
+            grid = np.zeros((nrows, width), dtype=np.int32)  # 0 = idle, else app code + 1
+            grid[np.repeat(rows, spans), pix] = np.repeat(codes + 1, spans)
+            busy = (grid > 0).mean()
+            pass
+
+        with self.stage('render timeline'):
+            fname = renderTimeline(grid, list(apps), wall, outfile,
+                                   f'Run {runnum}: {done.sum()} tries on {nLanes} workers, '
+                                   f'{wall:.1f} s, {100 * busy:.1f}% busy')
+            pass
+        print(f'Timeline of run {runnum} ({done.sum()} tries, {nLanes} workers) saved to {fname}')
+        return
+
+    def runDiff(self, runA=None, runB=None):
+        ## Compare two runs (default = the two most recent) app by app:
+        ## run, wait and elapsed time per try, retries and core-seconds
+        ## (runTime x cores per worker).  Tasks are aligned across the runs by
+        ## task_hashsum; the 'matched' run time change uses only hashsums present
+        ## in both runs, so it is not skewed by a different task mix.  Each
+        ## task contributes its last try with a runTime, and identical calls
+        ## within a run (one hashsum, several tasks) are averaged.
+        ## If only runA is given and it is the latest run, runB is the run before it.
+        if runB == None:
+            runB = self.runmax
+            if runA == runB: runB = runA - 1
+            pass
+        if runA == None: runA = runB - 1
+        if self.debug > 0: print(f'Entering runDiff(runA={runA},runB={runB})')
+        if runA == runB:
+            print(f'%ERROR: cannot compare run {runA} with itself')
+            return
+        for rn in [runA, runB]:
+            if rn not in self.runnum2id:
+                print(f'%ERROR: run {rn} is not in this database ({self.runmin}-{self.runmax})')
+                return
+            pass
+        nodeInfo = self.getNodeInfo()
+
+        def pct(a, b):
+            if a is None or b is None or a == 0: return None
+            return 100. * (b - a) / a
+
+        runStats = []  # per run: {appname:{...}}, {hashsum:runTime}, (workers,cpw)
+        for rn in [runA, runB]:
+            runID = self.runnum2id[rn]
+            (workers, cpus, cpw) = nodeInfo.get(runID, (None, None, None))
+            cores = cpw if cpw is not None else 1.0
+            apps = {}
+            finalRun = {}  # {task_id:(task_hashsum,appname,runTime of its last try with a runTime)}
+            for (taskID, hashsum, app, tryID, wait, run, elapsed) in self.sqlCmd(runTries.replace('#runid#', runID)):
+                a = apps.setdefault(app, {'tasks': set(), 'tries': 0, 'wait': 0., 'run': 0., 'elapsed': 0.,
+                                          'n': 0})
+                a['tasks'].add(taskID)
+                a['tries'] += 1
+                if run is not None and wait is not None:
+                    a['n'] += 1
+                    a['wait'] += wait
+                    a['run'] += run
+                    a['elapsed'] += elapsed
+                    if hashsum is not None: finalRun[taskID] = (hashsum, app, run)  # tries are in try_id order
+                    pass
+                pass
+            ## Identical calls in one run share a hashsum: average their run times
+            hashTimes = {}  # {task_hashsum:(appname,[runTime per task])}
+            for (hashsum, app, run) in finalRun.values():
+                hashTimes.setdefault(hashsum, (app, []))[1].append(run)
+                pass
+            hashRun = {hashsum: (app, sum(times) / len(times)) for (hashsum, (app, times)) in hashTimes.items()}
+            runStats.append((apps, hashRun, workers, cores))
+            pass
+
+        ## Calls (hashsums) present in both runs
+        (appsA, hashA, workersA, coresA) = runStats[0]
+        (appsB, hashB, workersB, coresB) = runStats[1]
+        matched = {}  # {appname:[#,runTimeA,runTimeB]}
+        for hashsum in hashA.keys() & hashB.keys():
+            (app, runTimeA) = hashA[hashsum]
+            m = matched.setdefault(app, [0, 0., 0.])
+            m[0] += 1
+            m[1] += runTimeA
+            m[2] += hashB[hashsum][1]
+            pass
+
+        rows = []
+        totals = [0., 0.]
+        for app in sorted(appsA.keys() | appsB.keys()):
+            a = appsA.get(app)
+            b = appsB.get(app)
+            row = [app, f'{len(a["tasks"]) if a else 0}/{len(b["tasks"]) if b else 0}']
+            m = matched.get(app)
+            row.append(m[0] if m else 0)
+            for key in ['run', 'wait', 'elapsed']:
+                va = a[key] / a['n'] if a and a['n'] else None
+                vb = b[key] / b['n'] if b and b['n'] else None
+                row += [va, vb]
+                if key == 'run' and m:
+                    row += [(m[2] - m[1]) / m[0], pct(m[1], m[2])]
+                else:
+                    row += [vb - va if va is not None and vb is not None else None, pct(va, vb)]
+                    pass
+                pass
+            retries = [x['tries'] - len(x['tasks']) if x else 0 for x in (a, b)]
+            row.append(f'{retries[0]}/{retries[1]}')
+            coreSec = [a['run'] * coresA if a else 0., b['run'] * coresB if b else 0.]
+            totals[0] += coreSec[0]
+            totals[1] += coreSec[1]
+            row += coreSec + [pct(coreSec[0], coreSec[1])]
+            rows.append(row)
+            pass
+        rows.sort(key=lambda row: -abs(row[-2] - row[-3]))
+
+        print(f'\nRun {runA} ({workersA} workers, {coresA:g} cores/worker) vs run {runB} '
+              f'({workersB} workers, {coresB:g} cores/worker). Mean time per try in seconds.')
+        print(tabulate(rows, headers=['appname', '#tasks A/B', '#matched', 'run A', 'run B', 'run chg', 'run chg %',
+                                      'wait A', 'wait B', 'wait chg', 'wait chg %',
+                                      'elapsed A', 'elapsed B', 'elapsed chg', 'elapsed chg %', 'retries A/B',
+                                      'core s A', 'core s B', 'core s chg %'],
+                       tablefmt=tblfmt, floatfmt='.2f', missingval='-'))
+        print(f'Total core-seconds: {totals[0]:.2f} (run {runA}) -> {totals[1]:.2f} (run {runB}), '
+              f'change {pct(totals[0], totals[1]) or 0.:+.1f}%')
+        return
+
+    def stragglerReport(self, runnum=None, k=3.0, limit=None):
+        ## Stragglers and retries, and what they cost.
+        ##   A straggler is a try whose runTime exceeds its app's median (in
+        ##   the same run) by more than k robust standard deviations
+        ##   (1.4826 x MAD, at least 5% of the median).  Retry cost is the
+        ##   runTime of every try but a task's last, in core-seconds.
+        ##   Makespan extension is charged along the critical path: starting
+        ##   from the last task to finish, repeatedly step to the dependency
+        ##   that finished last.  Each task on that path adds its straggler
+        ##   excess (runTime - app median) and the time lost to its failed
+        ##   tries (last try launched - first try launched, counting only time
+        ##   after its dependency on the path finished).
+        if self.debug > 0: print(f'Entering stragglerReport(runnum={runnum},k={k})')
+        import numpy as np
+        if runnum == None: runnum = self.runmax
+        nodeInfo = self.getNodeInfo()
+        rows = self.sqlCmd(dependTries.replace('#where#', ''))
+
+        ## {run_id:{task_id:{'app','deps','failCost','tries':[(launched,running,returned)]}}}
+        runs = {}
+        with self.stage('index tries'):
+            for (runID, taskID, tryID, app, depends, failCost, launched, running, returned) in rows:
+                tasks = runs.setdefault(runID, {})
+                if taskID not in tasks:
+                    deps = [int(d) for d in (depends or '').split(',') if d.strip().isdigit()]
+                    tasks[taskID] = {'app': app, 'deps': deps, 'failCost': failCost or 0., 'tries': []}
+                    pass
+                tasks[taskID]['tries'].append((launched, running, returned))
+                pass
+            pass
+
+        sumRows = []
+        detail = []
+        for runID in sorted(runs, key=lambda r: self.runid2num.get(r, 0)):
+            tasks = runs[runID]
+            rn = self.runid2num.get(runID)
+            (workers, cpus, cpw) = nodeInfo.get(runID, (None, None, None))
+            cores = cpw if cpw is not None else 1.0
+
+            ## Robust runTime statistics per app
+            runTimes = {}
+            for task in tasks.values():
+                for (launched, running, returned) in task['tries']:
+                    if running is not None and returned is not None:
+                        runTimes.setdefault(task['app'], []).append(returned - running)
+                    pass
+                pass
+            appStats = {}
+            for (app, times) in runTimes.items():
+                median = float(np.median(times))
+                scale = max(1.4826 * float(np.median(np.abs(np.array(times) - median))), 0.05 * median)
+                appStats[app] = (median, median + k * scale)
+                pass
+
+            ## Per-task straggler excess and retry loss
+            nTries = nRetries = nStragglers = 0
+            retryCost = failCost = stragglerCost = 0.
+            excess = {}  # {task_id:straggler excess of its last try}
+            launches = {}  # {task_id:(first launched,last launched)} of retried tasks
+            finished = {}  # {task_id:returned time of last try}
+            first = None
+            for (taskID, task) in tasks.items():
+                tries = task['tries']
+                nTries += len(tries)
+                nRetries += len(tries) - 1
+                failCost += task['failCost']
+                for (n, (launched, running, returned)) in enumerate(tries):
+                    if launched is not None and (first is None or launched < first): first = launched
+                    if running is None or returned is None: continue
+                    runTime = returned - running
+                    if n < len(tries) - 1: retryCost += runTime * cores
+                    (median, cut) = appStats[task['app']]
+                    if runTime > cut:
+                        nStragglers += 1
+                        stragglerCost += (runTime - median) * cores
+                        if n == len(tries) - 1: excess[taskID] = runTime - median
+                        detail.append([rn, taskID, task['app'], n, runTime, median, runTime - median, taskID])
+                        pass
+                    pass
+                if tries[-1][2] is not None: finished[taskID] = tries[-1][2]
+                if len(tries) > 1 and tries[0][0] is not None and tries[-1][0] is not None:
+                    launches[taskID] = (tries[0][0], tries[-1][0])
+                    pass
+                pass
+            if len(finished) == 0: continue
+
+            ## Walk the critical path back from the last task to finish
+            path = []
+            pathRetry = 0.
+            taskID = max(finished, key=finished.get)
+            while taskID is not None:
+                path.append(taskID)
+                deps = [d for d in tasks[taskID]['deps'] if d in finished]
+                pred = max(deps, key=finished.get) if deps else None
+                if taskID in launches:
+                    (firstLaunch, lastLaunch) = launches[taskID]
+                    ready = firstLaunch if pred is None else max(firstLaunch, finished[pred])
+                    pathRetry += max(0., lastLaunch - ready)
+                    pass
+                taskID = pred
+                pass
+            onPath = set(path)
+            pathStraggle = sum(excess.get(t, 0.) for t in path)
+            ## Unknown (printed as '?') if no try has a launch time
+            makespan = max(finished.values()) - first if first is not None else None
+            pctMakespan = 100. * (pathStraggle + pathRetry) / makespan if makespan else None
+            for row in detail:
+                if row[0] == rn: row[-1] = 'yes' if row[1] in onPath else ''
+                pass
+            sumRows.append([rn, workers, makespan, nTries, nRetries, failCost, retryCost, nStragglers, stragglerCost,
+                            len(path), pathStraggle, pathRetry, pctMakespan])
+            pass
+
+        print(f'\nStragglers (runTime > app median + {k:g} robust sigma) and retries per run. '
+              f'Time in seconds, cost in core-seconds.')
+        print(tabulate(sumRows, headers=['runnum', 'workers', 'makespan', '#tries', '#retries', 'fail cost',
+                                         'retry cost', '#stragglers', 'straggler cost', 'crit path tasks',
+                                         'crit path straggler s', 'crit path retry s', '% of makespan'],
+                       tablefmt=tblfmt, floatfmt='.2f', missingval='?'))
+
+        detail = [row for row in detail if row[0] == runnum]
+        detail.sort(key=lambda row: -row[6])
+        if limit is not None: detail = detail[:limit]
+        print(f'\nStragglers in run {runnum}, largest first')
+        print(tabulate(detail, headers=['runnum', 'task_id', 'appname', 'try', 'runTime', 'app median', 'excess',
+                                        'on crit path'], tablefmt=tblfmt, floatfmt='.2f'))
+        return
+
+    def cacheReport(self, runnum=None):
+        ## How much app_cache (memoization) saves, per run and per app.
+        ##   Hits are tasks that reached 'memo_done'.  Time saved by a hit is
+        ##   the run time of the latest earlier execution of the same
+        ##   task_hashsum (any run in this database), or the app's median run
+        ##   time when there is none ('estimated').  Overhead is the time from
+        ##   'pending' to the memo decision ('memo_done' for hits, 'launched'
+        ##   for misses), which covers hashing and the memo table lookup;
+        ##   it is only measured for tasks without dependencies, since
+        ##   otherwise it includes waiting for them.
+        if self.debug > 0: print(f'Entering cacheReport(runnum={runnum})')
+        import bisect
+        import numpy as np
+        if runnum == None: runnum = self.runmax
+        nodeInfo = self.getNodeInfo()
+
+        ## Past executions, {hashsum:([running times],[runTimes])}, and run times per app
+        history = {}
+        appTimes = {}
+        for (hashsum, app, running, runTime) in self.sqlCmd(cacheRunTimes):
+            appTimes.setdefault(app, []).append(runTime)
+            if hashsum is None: continue
+            h = history.setdefault(hashsum, ([], []))
+            h[0].append(running)
+            h[1].append(runTime)
+            pass
+        appMedian = {app: float(np.median(times)) for (app, times) in appTimes.items()}
+
+        runs = {}  # {run_id:{appname:[#tasks,#cacheable,#hits,saved,#estimated,[hit overheads],[miss overheads]]}}
+        for (runID, taskID, app, hashsum, memoize, depends, memoHit, pending, decided) in self.sqlCmd(cacheTasks):
+            a = runs.setdefault(runID, {}).setdefault(app, [0, 0, 0, 0., 0, [], []])
+            a[0] += 1
+            if str(memoize) in ['1', 'True'] and hashsum is not None: a[1] += 1
+            overhead = None
+            if pending is not None and decided is not None and not (depends or '').strip():
+                overhead = decided - pending
+                pass
+            if memoHit:
+                a[2] += 1
+                saved = None
+                if hashsum in history:
+                    (times, runTimes) = history[hashsum]
+                    k = bisect.bisect_left(times, decided) if decided is not None else len(times)
+                    saved = runTimes[k - 1] if k > 0 else None
+                    pass
+                if saved is None:
+                    saved = appMedian.get(app, 0.)
+                    a[4] += 1
+                    pass
+                a[3] += saved
+                if overhead is not None: a[5].append(overhead)
+            elif overhead is not None:
+                a[6].append(overhead)
+                pass
+            pass
+
+        def ms(values):
+            return 1000. * float(np.median(values)) if len(values) else None
+
+        sumRows = []
+        for runID in sorted(runs, key=lambda r: self.runid2num.get(r, 0)):
+            (workers, cpus, cpw) = nodeInfo.get(runID, (None, None, None))
+            cores = cpw if cpw is not None else 1.0
+            t = [sum(a[k] for a in runs[runID].values()) for k in range(5)]
+            hitOver = [x for a in runs[runID].values() for x in a[5]]
+            missOver = [x for a in runs[runID].values() for x in a[6]]
+            overhead = (ms(hitOver + missOver) or 0.) / 1000. * t[1] * cores
+            sumRows.append([self.runid2num.get(runID), t[0], t[1], t[2], 100. * t[2] / t[1] if t[1] else None,
+                            t[3], t[3] * cores, t[4], ms(hitOver), ms(missOver), t[3] * cores - overhead])
+            pass
+        print(f'\nApp cache effectiveness per run. Saved time in seconds (core s = x cores per worker), '
+              f'overhead = median pending-to-decision time of tasks without dependencies.')
+        print(tabulate(sumRows, headers=['runnum', '#tasks', '#cacheable', '#memo hits', 'hit rate %', 'saved s',
+                                         'saved core s', '#estimated', 'hit overhead ms', 'miss overhead ms',
+                                         'net core s'],
+                       tablefmt=tblfmt, floatfmt='.2f', missingval='-'))
+
+        runID = self.runnum2id.get(runnum)
+        if runID not in runs: return
+        (workers, cpus, cpw) = nodeInfo.get(runID, (None, None, None))
+        cores = cpw if cpw is not None else 1.0
+        rows = []
+        for (app, a) in sorted(runs[runID].items()):
+            over = ms(a[5] + a[6])
+            net = a[3] * cores - (over or 0.) / 1000. * a[1] * cores
+            rows.append([app, a[0], a[1], a[2], 100. * a[2] / a[1] if a[1] else None, a[3], a[4], ms(a[5]),
+                         ms(a[6]), net, 'yes' if net > 0 else 'no'])
+            pass
+        print(f'\nApp cache effectiveness in run {runnum}, by app')
+        print(tabulate(rows, headers=['appname', '#tasks', '#cacheable', '#memo hits', 'hit rate %', 'saved s',
+                                      '#estimated', 'hit overhead ms', 'miss overhead ms', 'net core s',
+                                      'pays off'],
+                       tablefmt=tblfmt, floatfmt='.2f', missingval='-'))
+        return
+
+    def waitReport(self, runnum=None, nbins=10):
+        ## Queue wait time (launched->running) distribution
+        ##   1) percentiles per run, next to the run's workers and cores per worker;
+        ##   2) percentiles per app (for runnum, or all runs); and,
+        ##   3) wait time over the course of runnum (default = latest run),
+        ##      in nbins equal slices of launch time.
+        ##   A median wait longer than the median runTime means tasks spend more
+        ##   time queued than running, i.e., the run is under-provisioned.
+        if self.debug > 0: print(f'Entering waitReport(runnum={runnum},nbins={nbins})')
+        import numpy as np
+        tries = self.loadTryTimes()
+        sel = ~np.isnan(tries['launched']) & ~np.isnan(tries['running'])
+        if not np.any(sel):
+            print('No launched tries to report')
+            return
+        with self.stage('collect wait times'):
+            runnums = tries['runnum'][sel]
+            apps = tries['appname'][sel]
+            launched = tries['launched'][sel]
+            waits = tries['running'][sel] - launched
+            runs = tries['returned'][sel] - tries['running'][sel]
+            pass
+        pctTitles = [f'p{p}' for p in waitPercentiles]
+
+        ## 1) Per run, with worker configuration
+        nodeInfo = self.getNodeInfo()
+        rows = []
+        xs = []  # [(coresPerWorker,workers,median wait)] for correlation
+        for rn in sorted(set(runnums)):
+            sel = runnums == rn
+            w = waits[sel]
+            (workers, cpus, cpw) = nodeInfo.get(self.runnum2id[rn], (None, None, None))
+            medRun = np.nanmedian(runs[sel]) if np.any(~np.isnan(runs[sel])) else np.nan
+            ratio = np.median(w) / medRun if medRun > 0 else None
+            rows.append([rn, workers, cpw, len(w), w.mean()] + list(np.percentile(w, waitPercentiles)) +
+                        [w.max(), ratio])
+            if cpw is not None: xs.append((cpw, workers, np.median(w)))
+            pass
+        print(f'\nQueue wait time (launched->running) per run. Time in seconds.')
+        print(tabulate(rows, headers=['runnum', 'workers', 'cores/worker', '#tries', 'mean'] + pctTitles +
+                                     ['max', 'median wait/run'],
+                       tablefmt=tblfmt, floatfmt='.2f', missingval='?'))
+        if len(xs) >= 3:
+            xs = np.array(xs, dtype=np.float64)
+            rCpw = np.corrcoef(xs[:, 0], xs[:, 2])[0, 1]
+            rWorkers = np.corrcoef(xs[:, 1], xs[:, 2])[0, 1]
+            print(f'Correlation of median wait with cores/worker: r = {rCpw:.2f}, with #workers: r = {rWorkers:.2f}')
+            pass
+
+        ## 2) Per app
+        sel = np.ones(len(waits), dtype=bool)
+        runTxt = 'all runs'
+        if runnum != None:
+            sel = runnums == runnum
+            runTxt = f'run {runnum}'
+            pass
+        rows = []
+        for app in dict.fromkeys(apps[sel]):
+            w = waits[sel & (apps == app)]
+            rows.append([app, len(w), w.mean()] + list(np.percentile(w, waitPercentiles)) + [w.max()])
+            pass
+        rows.sort(key=lambda row: -row[3])
+        if len(rows) == 0:
+            print(f'\nNo launched tasks in {runTxt}')
+        else:
+            print(f'\nQueue wait time per app for {runTxt}. Time in seconds.')
+            print(tabulate(rows, headers=['appname', '#tries', 'mean'] + pctTitles + ['max'],
+                           tablefmt=tblfmt, floatfmt='.2f'))
+            pass
+
+        ## 3) Over the course of one run
+        if runnum == None: runnum = int(max(runnums))
+        sel = runnums == runnum
+        if not np.any(sel):
+            print(f'\nNo launched tasks in run {runnum}')
+            return
+        t = launched[sel] - launched[sel].min()
+        w = waits[sel]
+        edges = np.linspace(0., max(t.max(), 1e-9), nbins + 1)
+        bins = np.clip(np.searchsorted(edges, t, side='right') - 1, 0, nbins - 1)
+        rows = []
+        for b in range(nbins):
+            wb = w[bins == b]
+            if len(wb) == 0:
+                rows.append([f'{edges[b]:.1f}-{edges[b + 1]:.1f}', 0, None, None, None])
+            else:
+                rows.append([f'{edges[b]:.1f}-{edges[b + 1]:.1f}', len(wb), wb.mean(),
+                             np.percentile(wb, 90), wb.max()])
+                pass
+            pass
+        print(f'\nQueue wait time over the course of run {runnum}, by launch time since the first launch. '
+              f'Time in seconds.')
+        print(tabulate(rows, headers=['launched at', '#tries', 'mean wait', 'p90', 'max'],
+                       tablefmt=tblfmt, floatfmt='.2f', missingval='-'))
         return
 
     def numTasksRunningHistory(self, runnum):
         ## Time history of # of running jobs {<timeStamp>:<increment/decrement>}
         if self.debug > 0: print(f'Entering numTasksRunningHistory')
+        import pandas as pd
         if runnum == None:
             print(f'No runnum specified, aborting')
             return
@@ -807,24 +2054,32 @@ class pmon:
         return
 
     def taskSummary(self, runnum=None, tasknum=None, taskid=None, taskname=None, status=None,
-                    limit=None, extendedCols=False, oddball=False):
+                    limit=None, extendedCols=False, oddball=False, stream=None):
         ## This is a summary of all cached tasks in the workflow.
+        ##   With stream='csv' or 'jsonl' only the task rows are written
         if self.debug > 0: print(f'Entering taskSummary(runnum={runnum},tasknum={tasknum},'
                                  f'taskid={taskid},taskname={taskname},status={status},'
-                                 f'limit={limit},extendedCols={extendedCols})')
-        self.printWorkflowSummary(runnum)
+                                 f'limit={limit},extendedCols={extendedCols},stream={stream})')
+        report = stream in [None, 'fixed']
+        if report: self.printWorkflowSummary(runnum)
         self.taskSum(runnum=runnum, tasknum=tasknum, taskid=taskid, taskname=taskname, status=status,
-                     limit=limit, extendedCols=extendedCols, oddball=oddball)
-        self.batchSummary(runnum=runnum, limit=limit)
-        self.taskStatusMatrix(runnum=runnum)
+                     limit=limit, extendedCols=extendedCols, oddball=oddball, stream=stream)
+        if report:
+            self.batchSummary(runnum=runnum, limit=limit)
+            self.taskStatusMatrix(runnum=runnum, tally=stream != None)
+            pass
         return
 
-    def taskHistory(self, runnum=None, tasknum=None, taskid=None, taskname=None, status=None, limit=None):
+    def taskHistory(self, runnum=None, tasknum=None, taskid=None, taskname=None, status=None, limit=None,
+                    stream=None):
         ## This produces a full history for specified task(s)
+        ##   With stream='csv' or 'jsonl' only the history rows are written
         if self.debug > 0: print(f'Entering taskHistory()')
-        if runnum != None: self.printWorkflowSummary(runnum)
-        self.taskHis(runnum=runnum, tasknum=tasknum, taskid=taskid, taskname=taskname, status=status, limit=limit)
-        self.taskStatusMatrix(runnum=runnum)
+        report = stream in [None, 'fixed']
+        if runnum != None and report: self.printWorkflowSummary(runnum)
+        self.taskHis(runnum=runnum, tasknum=tasknum, taskid=taskid, taskname=taskname, status=status, limit=limit,
+                     stream=stream)
+        if report: self.taskStatusMatrix(runnum=runnum, tally=stream != None)
         return
 
     def runHistory(self):
@@ -835,7 +2090,8 @@ class pmon:
             row = list(wrow)
             rows.append(row)
             pass
-        print(tabulate(rows, headers=self.wtitles, tablefmt=tblfmt))
+        with self.stage('tabulate output'):
+            print(tabulate(rows, headers=self.wtitles, tablefmt=tblfmt))
         return
 
     def recentStatus(self, limit=50):
@@ -846,15 +2102,617 @@ class pmon:
         (rows, titles) = self.stdQuery(sql)
         # Pretty print
         print(f'Recent workflow activity')
-        print(tabulate(rows, headers=titles, tablefmt=tblfmt))
+        with self.stage('tabulate output'):
+            print(tabulate(rows, headers=titles, tablefmt=tblfmt))
         return
 
-    def plots(self):
+    def plots(self, show=False, nproc=None):
         ## Produce various performance plots for this workflow **EXPERIMENTAL**
         if self.debug > 0: print(f'Entering plots()')
         self.runStats()
-        self.makePlots()
+        self.makePlots(show=show, nproc=nproc)
+        return
+
+
+def renderHistPage(job):
+    ## Render one canvas of pre-binned histograms to a jpg file, off screen.
+    ##   job = (title, metric, filename, [(appname,counts,edges),...])
+    ##   Uses a bare matplotlib Figure (no pyplot), so it is safe in worker
+    ##   processes and needs no display.
+    import numpy as np
+    from matplotlib.figure import Figure
+    (title, metric, fname, hists) = job
+    nhists = len(hists)
+
+    ## Prepare plotting canvas (a grid of up to 4 cols x N rows)
+    ncols = min(4, nhists)
+    nrows = (nhists + ncols - 1) // ncols
+    fig = Figure(figsize=(11, 8.5), tight_layout=True)  ## Establish canvas
+    fig.suptitle(title)  ## define plot title (before making plots)
+    for nhist, (taskType, counts, edges) in enumerate(hists, start=1):
+        x = fig.add_subplot(nrows, ncols, nhist)  # create a spot for the histogram
+        x.bar(edges[:-1], counts, width=np.diff(edges), align='edge')
+        x.set_xlabel(f'{metric} in minutes')
+        x.set_ylabel(f'# tasks')
+        x.set_title(fr'{taskType}')
+        pass
+    fig.savefig(fname)
+    return fname
+
+
+def renderTimeline(grid, apps, wall, outfile, title):
+    ## Render a painted timeline grid (see pmon.timeline) off screen.
+    ##   .html output embeds the image and an app legend in one file.
+    import io
+    import base64
+    import html
+    import numpy as np
+    from matplotlib.figure import Figure
+    from matplotlib.colors import ListedColormap
+    from matplotlib.patches import Patch
+    import matplotlib
+
+    (nrows, width) = grid.shape
+    palette = matplotlib.colormaps['tab20'].colors
+    colors = [(1., 1., 1.)] + [palette[k % len(palette)] for k in range(len(apps))]
+    fig = Figure(figsize=(width / 100 + 2.5, max(3., min(nrows, 900) / 100 + 1.5)), dpi=100)
+    ax = fig.add_subplot(1, 1, 1)
+    ax.imshow(grid, cmap=ListedColormap(colors), vmin=0, vmax=len(apps), aspect='auto',
+              interpolation='nearest', extent=[0, wall, nrows, 0])
+    ax.set_xlabel('seconds since start of run')
+    ax.set_ylabel('worker')
+    ax.set_title(title)
+    if len(apps) <= 40:
+        ax.legend(handles=[Patch(color=colors[k + 1], label=app) for k, app in enumerate(apps)],
+                  loc='upper left', bbox_to_anchor=(1.01, 1.), fontsize='small')
+        pass
+    fig.tight_layout()
+
+    if not outfile.lower().endswith('.html'):
+        fig.savefig(outfile)
+        return outfile
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    img = base64.b64encode(buf.getvalue()).decode('ascii')
+    legend = ''.join(f'<li><span style="background:rgb{tuple(int(255 * c) for c in colors[k + 1][:3])}">'
+                     f'&nbsp;&nbsp;&nbsp;&nbsp;</span> {html.escape(str(app))}</li>' for k, app in enumerate(apps))
+    title = html.escape(title)
+    with open(outfile, 'w') as f:
+        f.write(f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{title}</title></head>\n'
+                f'<body><h3>{title}</h3>\n<img src="data:image/png;base64,{img}">\n'
+                f'<ul style="list-style:none">{legend}</ul>\n</body></html>\n')
+        pass
+    return outfile
+
+
+def assignLanes(hosts, starts, ends):
+    ## Rebuild worker 'lanes' from try intervals: on each host, tries are
+    ## taken in start order and given to the worker that became free
+    ## earliest (interval partitioning), which uses the fewest workers that
+    ## could have run the observed schedule.  Returns the lane number of
+    ## each try within its host.
+    import heapq
+    import numpy as np
+    lanes = np.zeros(len(starts), dtype=np.int64)
+    free = {}  # {host:[(endTime,lane),...]} heap of busy workers
+    nlanes = {}  # {host:#lanes}
+    for i in np.lexsort((starts, hosts.astype(str))):
+        heap = free.setdefault(hosts[i], [])
+        if heap and heap[0][0] <= starts[i]:
+            (end, lane) = heapq.heappop(heap)
+        else:
+            lane = nlanes.get(hosts[i], 0)
+            nlanes[hosts[i]] = lane + 1
+            pass
+        lanes[i] = lane
+        heapq.heappush(heap, (ends[i], lane))
+        pass
+    return lanes
+
+
+def workerStats(hosts, lanes, starts, ends, began, completed):
+    ## Busy time and idle gaps for each (host, lane) worker between the run's
+    ## start and completion.  Returns a list of dictionaries, one per worker.
+    import numpy as np
+    workers = []
+    order = np.lexsort((starts, lanes, hosts.astype(str)))
+    keys = list(zip(hosts[order], lanes[order]))
+    i = 0
+    while i < len(order):
+        j = i
+        while j < len(order) and keys[j] == keys[i]: j += 1
+        s = starts[order[i:j]]
+        e = ends[order[i:j]]
+        idle = s[1:] - e[:-1]
+        workers.append({'host': keys[i][0], 'worker': int(keys[i][1]), 'tasks': j - i,
+                        'busy': float((e - s).sum()),
+                        'lead': float(max(0., s[0] - began)),
+                        'ngaps': int((idle > 0).sum()),
+                        'gaps': float(idle.clip(min=0).sum()),
+                        'maxgap': float(idle.max()) if len(idle) > 0 else 0.,
+                        'tail': float(max(0., completed - e[-1]))})
+        i = j
+        pass
+    return workers
+
+
+#############################################################################
+##
+##  Column store
+##
+##  exportColumns writes each monitoring table as one .npy file per column.
+##  colstore memory-maps them, so repeated reports only touch the columns
+##  they use and the OS page cache is shared between processes.
+##
+#############################################################################
+
+## Tables exported by default, and the marker used for NULL timestamps
+colTables = ['workflow', 'task', 'try', 'status', 'block', 'node', 'resource']
+colNull = -2 ** 63
+
+
+class colstore:
+    ### class colstore - memory-mapped columns written by pmon.exportColumns
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+            pass
+        self.arrays = {}  # {(table,column):memmap}
+        self.dicts = {}  # {(table,column):[strings]}
+        return
+
+    def isStale(self):
+        ## True if the source database has changed since the export
+        src = self.manifest['source']
+        if not os.path.exists(src): return False
+        return (os.path.getsize(src) != self.manifest['sourceSize'] or
+                os.path.getmtime(src) != self.manifest['sourceMtime'])
+
+    def column(self, table, name):
+        ## Memory-mapped column; text columns are int32 codes (see strings)
+        import numpy as np
+        key = (table, name)
+        if key not in self.arrays:
+            self.arrays[key] = np.load(os.path.join(self.path, table, f'{name}.npy'), mmap_mode='r')
+            pass
+        return self.arrays[key]
+
+    def strings(self, table, name):
+        ## Dictionary of a text column, indexed by code
+        key = (table, name)
+        if key not in self.dicts:
+            with open(os.path.join(self.path, table, f'{name}.dict.json')) as f:
+                self.dicts[key] = json.load(f)
+                pass
+            pass
+        return self.dicts[key]
+
+    def decode(self, table, name, sel=slice(None)):
+        ## Text column (or a selection of it) as an array of str/None
+        import numpy as np
+        values = np.array(self.strings(table, name) + [None], dtype=object)
+        return values[np.asarray(self.column(table, name)[sel])]
+
+    def seconds(self, table, name, sel=slice(None)):
+        ## Timestamp column as float unix seconds (NaN if NULL)
+        import numpy as np
+        us = np.asarray(self.column(table, name)[sel])
+        secs = us / 1e6
+        secs[us == colNull] = np.nan
+        return secs
+
+    def runCode(self, table, runID):
+        ## Code of a run_id in a table's run_id dictionary (-2 if absent)
+        strings = self.strings(table, 'run_id')
+        return strings.index(runID) if runID in strings else -2
+
+    def tryTimes(self, runnum=None):
+        ## Same result as pmon.loadTryTimes, read from the columns
+        import numpy as np
+        sel = slice(None)
+        if runnum != None: sel = np.flatnonzero(np.asarray(self.column('try', 'runnum')) == runnum)
+        runnums = np.asarray(self.column('try', 'runnum')[sel]).astype(np.int64)
+
+        ## appname comes from 'task', matched on (runnum, task_id)
+        tkey = (np.asarray(self.column('task', 'runnum')).astype(np.int64) << 32) + \
+               np.asarray(self.column('task', 'task_id'))
+        ykey = (runnums << 32) + np.asarray(self.column('try', 'task_id')[sel])
+        order = np.argsort(tkey)
+        idx = order[np.clip(np.searchsorted(tkey, ykey, sorter=order), 0, len(order) - 1)]
+        apps = self.decode('task', 'task_func_name', idx)
+        apps[tkey[idx] != ykey] = None
+
+        return {'runnum': runnums,
+                'appname': apps,
+                'hostname': self.decode('try', 'hostname', sel),
+                'launched': self.seconds('try', 'task_try_time_launched', sel),
+                'running': self.seconds('try', 'task_try_time_running', sel),
+                'returned': self.seconds('try', 'task_try_time_returned', sel)}
+
+    def runTimes(self, runID):
+        ## (began, completed) of one run in unix seconds; completed is None while running
+        import numpy as np
+        i = np.flatnonzero(np.asarray(self.column('workflow', 'run_id')) == self.runCode('workflow', runID))[0]
+        began = float(self.seconds('workflow', 'time_began', [i])[0])
+        completed = float(self.seconds('workflow', 'time_completed', [i])[0])
+        if np.isnan(completed): completed = None
+        return (began, completed)
+
+    def resourceStats(self, runID=None):
+        ## Same columns as the resourceStats query, reduced with numpy
+        import numpy as np
+        sel = slice(None)
+        if runID is not None:
+            sel = np.flatnonzero(np.asarray(self.column('resource', 'run_id')) == self.runCode('resource', runID))
+            pass
+        rrun = np.asarray(self.column('resource', 'runnum')[sel]).astype(np.int64)
+        rkey = (rrun << 40) + (np.asarray(self.column('resource', 'task_id')[sel]).astype(np.int64) << 8) + \
+               np.asarray(self.column('resource', 'try_id')[sel])
+        order = np.argsort(rkey, kind='stable')
+        rkey = rkey[order]
+        starts = np.flatnonzero(np.r_[True, rkey[1:] != rkey[:-1]]) if len(rkey) > 0 else np.array([], dtype=int)
+
+        def reduce(name, op):
+            values = np.asarray(self.column('resource', name)[sel])[order]
+            return op.reduceat(values, starts) if len(starts) > 0 else values[:0]
+
+        cpu = np.asarray(self.column('resource', 'psutil_process_time_user')[sel]) + \
+              np.asarray(self.column('resource', 'psutil_process_time_system')[sel])
+        cpu = cpu[order]
+        stats = {'cpuTime': (np.maximum.reduceat(cpu, starts) - np.minimum.reduceat(cpu, starts))
+                 if len(starts) > 0 else cpu[:0],
+                 'peakRSS': reduce('psutil_process_memory_resident', np.maximum),
+                 'readBytes': reduce('psutil_process_disk_read', np.maximum) -
+                              reduce('psutil_process_disk_read', np.minimum),
+                 'writeBytes': reduce('psutil_process_disk_write', np.maximum) -
+                               reduce('psutil_process_disk_write', np.minimum),
+                 'samples': np.diff(np.r_[starts, len(rkey)])}
+        keys = rkey[starts]
+
+        ## Join to tries (runTime, hostname, appname)
+        tries = self.tryTimes()
+        ykey = (tries['runnum'] << 40) + (np.asarray(self.column('try', 'task_id')).astype(np.int64) << 8) + \
+               np.asarray(self.column('try', 'try_id'))
+        yorder = np.argsort(ykey)
+        idx = yorder[np.clip(np.searchsorted(ykey, keys, sorter=yorder), 0, max(len(yorder) - 1, 0))]
+        found = ykey[idx] == keys
+        idx = idx[found]
+        runIDs = np.array(self.strings('try', 'run_id') + [None], dtype=object)
+        df = {'run_id': runIDs[np.asarray(self.column('try', 'run_id'))[idx]],
+              'task_id': np.asarray(self.column('try', 'task_id'))[idx],
+              'try_id': np.asarray(self.column('try', 'try_id'))[idx],
+              'appname': tries['appname'][idx],
+              'hostname': tries['hostname'][idx],
+              'runTime': tries['returned'][idx] - tries['running'][idx]}
+        for name in ['samples', 'cpuTime', 'peakRSS', 'readBytes', 'writeBytes']:
+            df[name] = stats[name][found]
+            pass
+        return df
+
+
+#############################################################################
+##
+##  Multi-database aggregation
+##
+##  Sweeps leave one monitoring.db per run directory.  Each database is
+##  reduced to compact per-run and per-app aggregates in a worker process
+##  (no views are needed), and the aggregates are merged into a single
+##  cross-run report keyed by worker count.
+##
+#############################################################################
+
+## Per-run wall time.  Times are returned in seconds.
+multiRunQuery = (
+    'select run_id,'
+    "strftime('%Y-%m-%d %H:%M:%S',time_began) as began,"
+    '(julianday(time_completed)-julianday(time_began))*86400 as elapsed '
+    'from workflow '
+    'order by time_began asc '
+)
+
+## Per-run worker and core count, as reported by the interchange.
+multiNodeQuery = (
+    'select run_id,sum(workers) as workers,sum(cpus) as cpus from '
+    '(select run_id,hostname,max(worker_count) as workers,max(cpu_count) as cpus '
+    'from node group by run_id,hostname) '
+    'group by run_id '
+)
+
+## Per-run, per-app try statistics.  Times are returned in seconds.
+multiAppQuery = (
+    'select y.run_id,t.task_func_name as appname,count(*) as numTries,'
+    'sum(julianday(y.task_try_time_returned)-julianday(y.task_try_time_running))*86400 as runTime,'
+    'sum(julianday(y.task_try_time_running)-julianday(y.task_try_time_launched))*86400 as waitTime '
+    'from try y '
+    'join task t on (t.run_id=y.run_id and t.task_id=y.task_id) '
+    'group by y.run_id,t.task_func_name '
+)
+
+
+def findDBfiles(paths, pattern='*.db'):
+    ## Expand a list of files and directories into a sorted list of
+    ## monitoring database files.  Directories are searched recursively.
+    dbfiles = set()
+    for path in paths:
+        if os.path.isdir(path):
+            dbfiles.update(glob.glob(os.path.join(path, '**', pattern), recursive=True))
+        elif os.path.exists(path):
+            dbfiles.add(path)
+        else:
+            print(f'%WARNING: no such file or directory, {path}')
+            pass
+        pass
+    return sorted(dbfiles)
+
+
+def runAggregates(dbfile):
+    ## Reduce one monitoring database to per-run aggregates.
+    ##   Runs in a worker process, so only plain (picklable) data is returned:
+    ##   {'dbfile':..., 'runs':[{run_id,began,elapsed,workers,cpus}], 'apps':[(run_id,appname,numTries,runTime,waitTime)]}
+    agg = {'dbfile': dbfile, 'runs': [], 'apps': [], 'error': None}
+    try:
+        con = sqlite3.connect(f'file:{os.path.abspath(dbfile)}?mode=ro', uri=True, timeout=30)
+        try:
+            tables = [r[0] for r in con.execute("select name from sqlite_master where type='table'")]
+            nodes = {}
+            if 'node' in tables:
+                for (runID, workers, cpus) in con.execute(multiNodeQuery):
+                    nodes[runID] = (workers, cpus)
+                    pass
+                pass
+            for (runID, began, elapsed) in con.execute(multiRunQuery):
+                (workers, cpus) = nodes.get(runID, (None, None))
+                agg['runs'].append({'run_id': runID, 'began': began, 'elapsed': elapsed,
+                                    'workers': workers, 'cpus': cpus})
+                pass
+            agg['apps'] = [tuple(row) for row in con.execute(multiAppQuery)]
+        finally:
+            con.close()
+    except sqlite3.Error as e:
+        agg['error'] = str(e)
+        pass
+    return agg
+
+
+def mergeAggregates(aggs):
+    ## Merge per-database aggregates into cross-run tables keyed by worker count
+    ##   Cost is in EEPS "core seconds" (run wall time x number of workers); per-app
+    ##   cost charges each try's runTime with the cores of the worker it ran on.
+    byWorkers = {}  # {workers:[#runs,sumElapsed,minElapsed,sumCost]}
+    byApp = {}  # {(appname,workers):[numTries,runTime,waitTime,coreSeconds]}
+    runInfo = {}  # {(dbfile,run_id):(workers,coresPerWorker)}
+    for agg in aggs:
+        for run in agg['runs']:
+            workers = run['workers']
+            cpw = 1.0
+            if workers and run['cpus']: cpw = run['cpus'] / workers
+            runInfo[(agg['dbfile'], run['run_id'])] = (workers, cpw)
+            if run['elapsed'] is None: continue  # run still active or aborted
+            stats = byWorkers.setdefault(workers, [0, 0.0, None, 0.0])
+            stats[0] += 1
+            stats[1] += run['elapsed']
+            if stats[2] is None or run['elapsed'] < stats[2]: stats[2] = run['elapsed']
+            if workers: stats[3] += run['elapsed'] * workers
+            pass
+        for (runID, appname, numTries, runTime, waitTime) in agg['apps']:
+            (workers, cpw) = runInfo.get((agg['dbfile'], runID), (None, 1.0))
+            stats = byApp.setdefault((appname, workers), [0, 0.0, 0.0, 0.0])
+            stats[0] += numTries
+            stats[1] += runTime or 0.0
+            stats[2] += waitTime or 0.0
+            stats[3] += (runTime or 0.0) * cpw
+            pass
+        pass
+    return (byWorkers, byApp)
+
+
+def multiRunSummary(paths, nproc=None, debug=0):
+    ## Cross-run report of runtime and cost per worker count and per app,
+    ## aggregated over many monitoring databases in parallel
+    dbfiles = findDBfiles(paths)
+    if len(dbfiles) == 0:
+        print('%ERROR: no monitoring database files found')
         return
+    if nproc is None: nproc = multiprocessing.cpu_count()
+    nproc = max(1, min(nproc, len(dbfiles)))
+    if debug > 0: print(f'Entering multiRunSummary: {len(dbfiles)} files, {nproc} processes')
+
+    aggs = []
+    with multiprocessing.Pool(nproc) as pool:
+        for agg in pool.imap_unordered(runAggregates, dbfiles):
+            if agg['error'] is not None:
+                print(f'%WARNING: skipping {agg["dbfile"]}: {agg["error"]}')
+                continue
+            aggs.append(agg)
+            pass
+        pass
+    (byWorkers, byApp) = mergeAggregates(aggs)
+    nRuns = sum(len(agg['runs']) for agg in aggs)
+
+    def workerKey(w):
+        return -1 if w is None else w
+
+    print(f'Cross-run summary of {nRuns} runs in {len(aggs)} monitoring databases. Time in seconds.')
+    rows = []
+    for workers in sorted(byWorkers, key=workerKey):
+        (n, sumElapsed, minElapsed, sumCost) = byWorkers[workers]
+        cost = sumCost / n if workers else None
+        rows.append([workers, n, sumElapsed / n, minElapsed, cost])
+        pass
+    print(tabulate(rows, headers=['workers', '#runs', 'mean elapsed', 'min elapsed', 'mean cost (core s)'],
+                   tablefmt=tblfmt, floatfmt='.2f', missingval='?'))
+
+    print(f'\nPer-app statistics by worker count (includes any retries). Time in seconds.')
+    rows = []
+    for (appname, workers) in sorted(byApp, key=lambda k: (k[0], workerKey(k[1]))):
+        (numTries, runTime, waitTime, coreSeconds) = byApp[(appname, workers)]
+        rows.append([appname, workers, numTries, runTime / numTries, waitTime / numTries, coreSeconds])
+        pass
+    print(tabulate(rows, headers=['appname', 'workers', '#(re)tries', 'mean runTime', 'mean waitTime',
+                                  'cost (core s)'],
+                   tablefmt=tblfmt, floatfmt='.2f', missingval='?'))
+    return
+
+
+#############################################################################
+##
+##  Archival and compaction
+##
+##  Selected runs are copied, with the live database's table definitions,
+##  into one monitoring database file per run, then deleted from the live
+##  database in small transactions (so a running MonitoringHub is only
+##  briefly locked out), and the live file is vacuumed and re-analyzed.
+##  Archive files are ordinary monitoring databases: pass the archive
+##  directory to the multiRun report (-F) to include them.
+##
+#############################################################################
+
+## Tables holding per-run data.  Children first, so an interrupted
+## delete never leaves rows without their workflow entry.
+archiveTables = ['resource', 'status', 'try', 'task', 'node', 'block', 'workflow']
+archiveBatch = 5000
+## The name in a CREATE TABLE/INDEX statement, quoted or not, follows this prefix
+archiveDDL = re.compile(r'^(\s*CREATE\s+(?:UNIQUE\s+)?(?:TABLE|INDEX)\s+(?:IF\s+NOT\s+EXISTS\s+)?)',
+                        re.IGNORECASE)
+
+
+def selectArchiveRuns(con, runnums=None, keep=None, olderThan=None):
+    ## Return [(runnum,run_id,began)] of runs to archive, numbered as in runview.
+    ##   runnums = explicit run numbers; keep = archive all but the newest N runs;
+    ##   olderThan = archive runs that began more than this many days ago.
+    ##   The newest run, and any run without a time_completed, may still be
+    ##   running and is never selected.
+    runs = [(n + 1, runID, began, completed) for (n, (runID, began, completed)) in
+            enumerate(con.execute('select run_id,time_began,time_completed from workflow order by time_began asc'))]
+    selected = []
+    for (n, (runnum, runID, began, completed)) in enumerate(runs):
+        if runnums is not None and runnum in runnums:
+            pass
+        elif keep is not None and n < len(runs) - keep:
+            pass
+        elif olderThan is not None:
+            age = con.execute("select julianday('now')-julianday(?)", (began,)).fetchone()[0]
+            if age is None or age <= olderThan: continue
+        else:
+            continue
+        if n == len(runs) - 1:
+            print(f'%WARNING: run {runnum} is the newest run and may still be running; not archived')
+        elif completed is None:
+            print(f'%WARNING: run {runnum} has not completed (no time_completed); not archived')
+        else:
+            selected.append((runnum, runID, began))
+            pass
+        pass
+    return selected
+
+
+def archiveRun(con, runID, archiveFile):
+    ## Copy all rows of one run into archiveFile (created from the live schema).
+    ##   The copy is written to a temporary file and renamed into place only
+    ##   when complete, so an existing archive file is always a whole run.
+    ##   Only the archiveTables present in the live database are copied.
+    ##   Returns {table:#rows} in the archive.
+    tables = presentTables(con, 'main')
+    if not os.path.exists(archiveFile):
+        tmpFile = archiveFile + '.tmp'
+        if os.path.exists(tmpFile): os.remove(tmpFile)
+        con.execute('attach database ? as arch', (tmpFile,))
+        try:
+            for (sql,) in con.execute("select sql from main.sqlite_master "
+                                      "where type in ('table','index') and sql is not null "
+                                      "and name not like 'sqlite_%'").fetchall():
+                ## Qualify the (possibly quoted) table or index name with the archive schema
+                con.execute(archiveDDL.sub(r'\1arch.', sql, count=1))
+                pass
+            with con:
+                for table in tables:
+                    con.execute(f'insert into arch."{table}" select * from main."{table}" where run_id=?', (runID,))
+                    pass
+                pass
+        finally:
+            con.execute('detach database arch')
+            pass
+        os.replace(tmpFile, archiveFile)
+        pass
+    arch = sqlite3.connect(archiveFile)
+    try:
+        counts = {table: arch.execute(f'select count(*) from "{table}"').fetchone()[0]
+                  for table in presentTables(arch, 'main') if table in tables}
+    finally:
+        arch.close()
+    return counts
+
+
+def presentTables(con, schema):
+    ## The archiveTables that exist in schema, in archiveTables order
+    names = {row[0] for row in con.execute(f"select name from {schema}.sqlite_master where type='table'")}
+    return [table for table in archiveTables if table in names]
+
+
+def deleteRun(con, runID, counts, batch=archiveBatch):
+    ## Delete one run from the live database, batch rows per transaction.
+    ##   Nothing is deleted unless the archive holds, for every table in
+    ##   counts (and no other table has rows of the run), as many rows as
+    ##   the live database does.
+    for table in presentTables(con, 'main'):
+        live = con.execute(f'select count(*) from "{table}" where run_id=?', (runID,)).fetchone()[0]
+        if live > counts.get(table, 0):
+            print(f'%ERROR: archive of run {runID} has {counts.get(table, 0)} {table} rows, live database has {live}; '
+                  'run not deleted')
+            return False
+        pass
+    for table in counts:
+        while True:
+            with con:
+                n = con.execute(f'delete from "{table}" where rowid in '
+                                f'(select rowid from "{table}" where run_id=? limit ?)', (runID, batch)).rowcount
+            if n < batch: break
+            pass
+        pass
+    return True
+
+
+def archiveRuns(dbfile, dest=None, runnums=None, keep=None, olderThan=None, batch=archiveBatch,
+                dryRun=False, debug=0):
+    ## Move selected runs from dbfile into per-run archive databases in dest,
+    ## then vacuum and analyze dbfile
+    if dest is None: dest = os.path.splitext(dbfile)[0] + '.archive'
+    if runnums is None and keep is None and olderThan is None:
+        print('%ERROR: select runs to archive with --runs, --keep or --olderThan')
+        return
+    con = sqlite3.connect(dbfile, timeout=30, isolation_level=None)
+    try:
+        selected = selectArchiveRuns(con, runnums=runnums, keep=keep, olderThan=olderThan)
+        if len(selected) == 0:
+            print('No runs selected for archival')
+            return
+        print(f'{"Would archive" if dryRun else "Archiving"} {len(selected)} run(s) into {dest}')
+        if dryRun:
+            for (runnum, runID, began) in selected: print(f'  run {runnum} {runID} began {began}')
+            return
+        os.makedirs(dest, exist_ok=True)
+        sizeBefore = os.path.getsize(dbfile)
+        rows = []
+        stem = os.path.splitext(os.path.basename(dbfile))[0]
+        for (runnum, runID, began) in selected:
+            archiveFile = os.path.join(dest, f'{stem}-{runID}.db')
+            if debug > 0: print(f'run {runnum} {runID} -> {archiveFile}')
+            counts = archiveRun(con, runID, archiveFile)
+            deleted = deleteRun(con, runID, counts, batch=batch)
+            rows.append([runnum, runID, began, counts.get('task'), counts.get('try'), counts.get('resource'),
+                         'yes' if deleted else 'NO', os.path.basename(archiveFile)])
+            pass
+        print(tabulate(rows, headers=['runnum', 'run_id', 'began', '#tasks', '#tries', '#resource', 'deleted',
+                                      'archive file'], tablefmt=tblfmt, missingval='-'))
+        print('Vacuuming and analyzing', dbfile)
+        con.execute('vacuum')
+        con.execute('analyze')
+        print(f'{dbfile}: {sizeBefore / 1e6:.2f} MB -> {os.path.getsize(dbfile) / 1e6:.2f} MB. '
+              'Note that remaining runs are renumbered.')
+    finally:
+        con.close()
+    return
 
 
 #############################################################################
@@ -869,7 +2727,7 @@ class pmon:
 if __name__ == '__main__':
 
     reportTypes = ['shortSummary', 'taskSummary', 'taskHistory', 'nctaskSummary', 'runHistory', 'recentStatus', 'plots',
-                   'experimental']
+                   'resources', 'workers', 'waits', 'timeline', 'diff', 'stragglers', 'cache', 'export', 'multiRun', 'archive', 'experimental']
 
     ## Parse command line arguments
     parser = argparse.ArgumentParser(
@@ -881,6 +2739,27 @@ if __name__ == '__main__':
     parser.add_argument('-f', '--file', default='./monitoring.db',
                         help='name of Parsl monitoring database file (default=%(default)s)')
     parser.add_argument('-r', '--runnum', type=int, help='Specific run number of interest (default = latest)')
+    parser.add_argument('-F', '--files', nargs='+', default=None,
+                        help='monitoring database files and/or directories to search for *.db (multiRun only)')
+    parser.add_argument('-j', '--nproc', type=int, default=None,
+                        help='number of worker processes for multiRun and plots (default = # cores)')
+    parser.add_argument('-C', '--columns', default=None,
+                        help='column store directory: written by the export report (default = <file>.cols), '
+                             'read instead of sqlite by the resources, workers and waits reports')
+    parser.add_argument('--vs', type=int, default=None,
+                        help='second run number for the diff report, compared against --runnum '
+                             '(default = latest, or the run before it when --runnum is the latest)')
+    parser.add_argument('--runs', type=int, nargs='+', default=None, help='run numbers to archive (archive only)')
+    parser.add_argument('--keep', type=int, default=None,
+                        help='archive all but the newest N runs (archive only)')
+    parser.add_argument('--olderThan', type=float, default=None,
+                        help='archive runs that began more than this many days ago (archive only)')
+    parser.add_argument('--archiveDir', default=None,
+                        help='directory for per-run archive databases (default = <file> with .archive suffix)')
+    parser.add_argument('--archiveBatch', type=int, default=archiveBatch,
+                        help='rows deleted per transaction when archiving (default = %(default)s)')
+    parser.add_argument('--dryRun', action='store_true', default=False,
+                        help='list the runs that would be archived and stop (archive only)')
     parser.add_argument('-s', '--schemas', action='store_true', default=False,
                         help="only print out monitoring db schema for all tables")
     parser.add_argument('-t', '--tasknum', default=None, help="specify tasknum (required for taskHistory)")
@@ -893,17 +2772,43 @@ if __name__ == '__main__':
                         help="limit output to N tasks (default is no limit)")
     parser.add_argument('-L', '--statusLimit', type=int, default=20,
                         help="limit status lines to N (default = %(default)s)")
+    parser.add_argument('--stream', choices=streamFormats, default=None,
+                        help="stream taskSummary/taskHistory rows as they are read, in fixed-width, "
+                             "CSV or JSON-lines form (default = tabulate the full result)")
+    parser.add_argument('--streamBatch', type=int, default=streamBatch,
+                        help="number of rows fetched per batch when streaming (default = %(default)s)")
+    parser.add_argument('-c', '--coresPerWorker', type=float, default=None,
+                        help="cores allocated per worker (resources only; default = from the node table)")
+    parser.add_argument('--idleFraction', type=float, default=0.5,
+                        help="flag apps whose CPU utilization is below this fraction (default = %(default)s)")
+    parser.add_argument('--stragglerK', type=float, default=3.0,
+                        help="flag tries this many robust standard deviations slower than their app's median "
+                             "(stragglers only; default = %(default)s)")
+    parser.add_argument('--plotFile', default=None,
+                        help="output of the timeline report, an image or .html file (default = timeline-<runnum>.png)")
+    parser.add_argument('--show', action='store_true', default=False,
+                        help="display plots interactively after saving them (plots only)")
     parser.add_argument('-x', '--extendedCols', action='store_true', default=False, help="print out extended columns")
+    parser.add_argument('-R', '--readonly', action='store_true', default=False,
+                        help="open the database read-only, e.g., while a workflow is still writing to it")
+    parser.add_argument('-P', '--profile', action='store_true', default=False,
+                        help="time every SQL statement and processing stage, then print a ranked hot-spot "
+                             "table with query plans")
     parser.add_argument('-u', '--updateViews', action='store_true', default=False,
                         help="force update of sqlite3 views (currently a no-op)")
     parser.add_argument('-d', '--debug', type=int, default=0, help='Set debug level (default = %(default)s)')
     parser.add_argument('-X', '--experimental', action='store_true', default=False, help='Take a chance!')
     parser.add_argument('-v', '--version', action='version', version=__version__)
 
-    print(sys.version)
-
     args = parser.parse_args()
-    print('wstat - Parsl workflow status (version ', __version__, ', written for Parsl version ' + pVersion + ')\n')
+
+    ## CSV and JSON-lines streams are meant for other programs, so keep the banners off stdout
+    banner = sys.stdout
+    if args.stream in ['csv', 'jsonl']: banner = sys.stderr
+
+    print(sys.version, file=banner)
+    print('wstat - Parsl workflow status (version ', __version__, ', written for Parsl version ' + pVersion + ')\n',
+          file=banner)
 
     if args.debug > 0:
         print('command line args: ', args)
@@ -911,13 +2816,31 @@ if __name__ == '__main__':
 
     startTime = datetime.datetime.now()
 
+    ## Multi-database report does not use a single pmon object
+    if args.reportType == 'multiRun':
+        multiRunSummary(args.files or [args.file], nproc=args.nproc, debug=args.debug)
+        print("wstat elapsed time = ", datetime.datetime.now() - startTime, file=banner)
+        sys.exit()
+
+    ## Archival works on the raw tables and needs no views
+    if args.reportType == 'archive':
+        if not os.path.exists(args.file):
+            print("%ERROR: monitoring database file not found, ", args.file)
+            sys.exit(1)
+        archiveRuns(args.file, dest=args.archiveDir, runnums=args.runs, keep=args.keep, olderThan=args.olderThan,
+                    batch=args.archiveBatch, dryRun=args.dryRun, debug=args.debug)
+        print("wstat elapsed time = ", datetime.datetime.now() - startTime, file=banner)
+        sys.exit()
+
     ## Check monitoring database exists
     if not os.path.exists(args.file):
         print("%ERROR: monitoring database file not found, ", args.file)
         sys.exit(1)
 
     ## Create a Parsl Monitor object
-    m = pmon(dbfile=args.file, debug=args.debug)
+    m = pmon(dbfile=args.file, debug=args.debug, readonly=args.readonly, profile=args.profile)
+    m.streamBatch = args.streamBatch
+    if args.columns is not None and args.reportType != 'export': m.useColumns(args.columns)
 
     ## Print out table schemas only
     if args.schemas:
@@ -955,10 +2878,10 @@ if __name__ == '__main__':
     elif args.reportType == 'taskSummary':
         m.taskSummary(runnum=args.runnum, tasknum=args.tasknum, taskid=args.taskID, status=args.taskStatus,
                       taskname=args.taskName, limit=args.taskLimit,
-                      extendedCols=args.extendedCols, oddball=args.oddballTasks)
+                      extendedCols=args.extendedCols, oddball=args.oddballTasks, stream=args.stream)
     elif args.reportType == 'taskHistory':
         m.taskHistory(runnum=args.runnum, tasknum=args.tasknum, taskid=args.taskID, status=args.taskStatus,
-                      taskname=args.taskName, limit=args.taskLimit)
+                      taskname=args.taskName, limit=args.taskLimit, stream=args.stream)
     elif args.reportType == 'nctaskSummary':
         m.nctaskSummary()
     elif args.reportType == 'runHistory':
@@ -966,7 +2889,23 @@ if __name__ == '__main__':
     elif args.reportType == 'recentStatus':
         m.recentStatus(args.statusLimit)
     elif args.reportType == 'plots':
-        m.plots()
+        m.plots(show=args.show, nproc=args.nproc)
+    elif args.reportType == 'resources':
+        m.resourceReport(runnum=args.runnum, cpw=args.coresPerWorker, idleFraction=args.idleFraction)
+    elif args.reportType == 'workers':
+        m.workerReport(runnum=args.runnum, limit=args.taskLimit)
+    elif args.reportType == 'waits':
+        m.waitReport(runnum=args.runnum)
+    elif args.reportType == 'timeline':
+        m.timeline(runnum=args.runnum, outfile=args.plotFile)
+    elif args.reportType == 'diff':
+        m.runDiff(runA=args.runnum, runB=args.vs)
+    elif args.reportType == 'stragglers':
+        m.stragglerReport(runnum=args.runnum, k=args.stragglerK, limit=args.taskLimit)
+    elif args.reportType == 'cache':
+        m.cacheReport(runnum=args.runnum)
+    elif args.reportType == 'export':
+        m.exportColumns(dest=args.columns)
     elif args.reportType == 'experimental':
         m.numTasksRunningHistory(args.runnum)
 
@@ -977,6 +2916,9 @@ if __name__ == '__main__':
         sys.exit(1)
         pass
 
+    ## Profile report goes with the banners, so streamed CSV/JSON stays clean
+    if args.profile: m.printProfile(out=banner)
+
     ## Done
     endTime = datetime.datetime.now()
-    print("wstat elapsed time = ", endTime - startTime)
+    print("wstat elapsed time = ", endTime - startTime, file=banner)
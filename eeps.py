@@ -22,6 +22,8 @@ from parsl.data_provider.ftp import FTPInTaskStaging
 from parsl.data_provider.file_noop import NoOpFileStaging
 
 import time
+import csv
+import datetime
 
 
 # Loading list of cpw depending on the amount of cores in ones system
@@ -37,12 +39,21 @@ for j in range(1, cores+1):
 
 working_dir = os.getcwd() + "/" + "test_htex_alternate"
 
+# Warm-up tasks run on each worker before the timer starts (0 = time from a cold start, as before)
+# Worker start-up, imports and the first tasks are then reported separately as the cold-start cost,
+# and the timed results show steady-state performance, as in a long pipeline
+
+warmup_tasks = 0
+warmup_seconds = 0.5
+
 
 # Creation of fresh config that is variable
 # The config will change everytime the loop runs as cpw_input will be varied
 # The config will be loaded and cleared at several locations during the loop cycle
 
-def fresh_config(cpw_input):
+# checkpoint_mode, checkpoint_period and checkpoint_files are only changed by the checkpoint sweep below
+
+def fresh_config(cpw_input, checkpoint_mode='task_exit', checkpoint_period=None, checkpoint_files=None):
     return Config(
         executors=[
             HighThroughputExecutor(
@@ -64,7 +75,9 @@ def fresh_config(cpw_input):
             )
         ],
         strategy='simple',
-        app_cache=True, checkpoint_mode='task_exit',
+        app_cache=True, checkpoint_mode=checkpoint_mode,
+        checkpoint_period=checkpoint_period,
+        checkpoint_files=checkpoint_files,
         retries=2,
         monitoring=MonitoringHub(
                         hub_address="localhost",
@@ -75,7 +88,8 @@ def fresh_config(cpw_input):
     )
 
 # Applications
-# Replaces Lines 81-239 with your own apps to test
+# Replace the apps below and the body of workflow() with your own apps to test
+# (and list them in workflow_apps, below workflow())
 
 
 @python_app
@@ -238,10 +252,68 @@ def app_Z(a,b,c,d,e,f,g,h,i,j,k,l,m,n,o,p,q,r,s,t):
     z = (a + b) - c * d + e - f + (g - h) + i / j - (k + l)
     return z * (n + r) / m + o + p - (q * t / s)
 
+# The compilation of apps that is timed, returning its total
+
+def workflow():
+    return app_Z(app_D(app_A(), app_G(), app_M()),
+                 app_E(5, 10, 15, 20),
+                 app_F(9, app_M(), app_E(19, app_N(6), 24, 34), 45, app_B(8)),
+                 app_J(app_H(app_G()), app_D(5, 2, 9), 5),
+                 app_K(52, app_A(), 13, 54),
+                 app_L(app_N(13), 22, app_H(11), 27, 18),
+                 app_P(50, 16, app_M()),
+                 app_Q(14, 23, 20, 45),
+                 app_R(48, 20, 30, app_O(21, 38), 23),
+                 app_S(app_I(47, 7), 29, 48, 3, 5, 24),
+                 app_T(4, 11, 46, 36, 48, 38, 6),
+                 app_U(25, 29, 36, 12, 7, 14, 10, 50),
+                 app_V(44, 30, 35, 10, app_Q(34, 8, 12, 49), 7, 15, 21, 47),
+                 app_W(49, 31, app_I(9, 7), 20, 32, 29, 23, 15, 27, 1),
+                 app_X(41, 20, app_B(44), 21, 48, 45, 41, 20, app_C(24, 33), 7, 36),
+                 app_Y(0, 31, 5, app_N(40), 46, 40, 22, 1, 16, 32, 12, 42),
+                 app_A(),
+                 app_B(28),
+                 app_C(45, app_B(app_P(42, 37, app_M()))),
+                 app_M()).result()
+
+# The apps used by workflow()
+# Parsl only gives a task a hashsum, and so only memoizes and checkpoints it, when app_cache is set in the config
+# and cache is set on its app. The apps are declared without cache, so the cores per worker sweep pays for no
+# hashing or checkpoint writes and gets no memo hits; only the checkpoint sweep turns cache on
+
+workflow_apps = [app_A, app_B, app_C, app_D, app_E, app_F, app_G, app_H, app_I, app_J, app_K, app_L, app_M,
+                 app_N, app_O, app_P, app_Q, app_R, app_S, app_T, app_U, app_V, app_W, app_X, app_Y, app_Z]
+
+def set_app_cache(cache):
+    for app in workflow_apps:
+        app.cache = cache
+
+# Warm-up: warmup_tasks waves of one short task per worker, returning the seconds they took beyond their sleep time
+# Each wave is finished before the next is submitted, and a busy worker takes no second task, so normally every
+# worker runs one task per wave; HTEX does not guarantee this (e.g. if a worker starts late), so the cold-start
+# cost is an approximation
+
+@python_app
+def warmup_app(seconds):
+    time.sleep(seconds)
+    return seconds
+
+def warm_up(cores_per_worker):
+    if warmup_tasks <= 0:
+        return 0
+    workers = int(round(cores / cores_per_worker))
+    tWarm = time.perf_counter()
+    for wave in range(warmup_tasks):
+        warm = [warmup_app(warmup_seconds) for n in range(workers)]
+        for w in warm:
+            w.result()
+    return max(time.perf_counter() - tWarm - warmup_tasks * warmup_seconds, 0)
+
 total = 0
 
 totalTimes = []
 totalCost = []
+coldStarts = []
 
 
 # Printing statistics for each runtime based on cores per worker
@@ -250,27 +322,9 @@ totalCost = []
 for i in range(len(cpw)):
     cores_per_worker = cpw[i]
     parsl.load(fresh_config(cores_per_worker))
+    coldStarts.append(warm_up(cores_per_worker))
     tStart = time.perf_counter()
-    total = app_Z(app_D(app_A(), app_G(), app_M()),
-                  app_E(5, 10, 15, 20),
-                  app_F(9, app_M(), app_E(19, app_N(6), 24, 34), 45, app_B(8)),
-                  app_J(app_H(app_G()), app_D(5, 2, 9), 5),
-                  app_K(52, app_A(), 13, 54),
-                  app_L(app_N(13), 22, app_H(11), 27, 18),
-                  app_P(50, 16, app_M()),
-                  app_Q(14, 23, 20, 45),
-                  app_R(48, 20, 30, app_O(21, 38), 23),
-                  app_S(app_I(47, 7), 29, 48, 3, 5, 24),
-                  app_T(4, 11, 46, 36, 48, 38, 6),
-                  app_U(25, 29, 36, 12, 7, 14, 10, 50),
-                  app_V(44, 30, 35, 10, app_Q(34, 8, 12, 49), 7, 15, 21, 47),
-                  app_W(49, 31, app_I(9, 7), 20, 32, 29, 23, 15, 27, 1),
-                  app_X(41, 20, app_B(44), 21, 48, 45, 41, 20, app_C(24, 33), 7, 36),
-                  app_Y(0, 31, 5, app_N(40), 46, 40, 22, 1, 16, 32, 12, 42),
-                  app_A(),
-                  app_B(28),
-                  app_C(45, app_B(app_P(42, 37, app_M()))),
-                  app_M()).result()
+    total = workflow()
     tEnd = time.perf_counter()
     totalTimes.append(tEnd - tStart)
     totalCost.append((tEnd-tStart)*(cores/cores_per_worker))
@@ -281,10 +335,40 @@ for i in range(len(cpw)):
     print()
     print("Cores per worker: " + str(cores_per_worker))
     print("Total: " + str(total))
+    if warmup_tasks > 0:
+        print("Cold start: " + str(round(coldStarts[-1], 2)) + " seconds, " +
+              str(round(coldStarts[-1] * (cores / cores_per_worker), 2)) + " core seconds (not included above)")
     print()
     parsl.dfk().cleanup()
     parsl.clear()
 
+# Saving the results of this sweep so they can be analyzed later (see sweepAnalysis.py)
+# Each sweep is appended to the same file
+# A file written with other columns (e.g. before warm-up was added) is left alone, and the results go to
+# the first of eepsResults-1.csv, eepsResults-2.csv, ... that is new or has these columns
+
+resultsHeader = ["date", "cores", "workers", "coresPerWorker", "time", "cost", "warmupTasks", "coldStart"]
+resultsFile = "eepsResults.csv"
+fileNumber = 0
+while os.path.exists(resultsFile):
+    with open(resultsFile, newline="") as f:
+        if next(csv.reader(f), None) == resultsHeader:
+            break
+    fileNumber += 1
+    resultsFile = "eepsResults-" + str(fileNumber) + ".csv"
+if fileNumber > 0:
+    print("eepsResults.csv has other columns, so results are saved in " + resultsFile +
+          " (pass both files to sweepAnalysis.py)")
+newFile = not os.path.exists(resultsFile)
+sweepDate = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+with open(resultsFile, "a", newline="") as f:
+    writer = csv.writer(f)
+    if newFile:
+        writer.writerow(resultsHeader)
+    for i in range(len(cpw)):
+        writer.writerow([sweepDate, cores, cores / cpw[i], cpw[i], totalTimes[i], totalCost[i], warmup_tasks,
+                         coldStarts[i]])
+
 # Matplots
 
 workers = []
@@ -361,3 +445,126 @@ print("Core seconds: " + str(round(fastCost, 2)))
 print("Seconds: " + str(round(minTime, 2)))
 print(str(round(secondTime - minTime, 2)) + " seconds faster than next fastest")
 print("Percentage faster: " + str(round(pctTime, 2)) + "%")
+
+if warmup_tasks > 0:
+    print(" ")
+    print("Cold start (" + str(warmup_tasks) + " warm-up tasks per worker, not included above): ")
+    for i in range(len(cpw)):
+        print("Workers: " + str(cores / cpw[i]) + ", seconds: " + str(round(coldStarts[i], 2)) +
+              ", core seconds: " + str(round(coldStarts[i] * (cores / cpw[i]), 2)))
+
+
+# Checkpointing sweep
+# The workflow is run once for each checkpoint mode below, at the cheapest cores per worker found above
+# Time includes parsl.dfk().cleanup(), where dfk_exit writes its checkpoint
+# Overhead is compared with the run without checkpointing, and I/O is the size of the checkpoint
+# Recovery is the time to load a new config from the checkpoint and rerun the workflow
+# Every mode also checkpoints in parsl.dfk().cleanup(), so each checkpoint holds every task of the workflow,
+# and in the recovery run every task is a memo hit
+# App caching is on for this sweep, so a workflow that calls an app twice with the same arguments may also get
+# memo hits within a timed run
+# Empty the list to skip this sweep; overhead is only reported when (None, None) (no checkpointing) is in it
+
+checkpointModes = [(None, None), ("task_exit", None), ("periodic", "00:00:05"), ("periodic", "00:00:30"),
+                   ("dfk_exit", None)]
+
+
+def checkpoint_bytes(run_dir):
+    size = 0
+    checkpoint_dir = os.path.join(run_dir, "checkpoint")
+    if os.path.isdir(checkpoint_dir):
+        for name in os.listdir(checkpoint_dir):
+            size += os.path.getsize(os.path.join(checkpoint_dir, name))
+    return size
+
+
+def written_bytes():
+    # Bytes written so far by this process, from /proc (None where that is not available)
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+checkpointResults = []
+if checkpointModes:
+    set_app_cache(True)
+
+for mode, period in checkpointModes:
+    parsl.load(fresh_config(optimalCPW, checkpoint_mode=mode, checkpoint_period=period))
+    warm_up(optimalCPW)
+    run_dir = parsl.dfk().run_dir
+    wStart = written_bytes()
+    tStart = time.perf_counter()
+    workflow()
+    parsl.dfk().cleanup()
+    tEnd = time.perf_counter()
+    wEnd = written_bytes()
+    parsl.clear()
+    written = None
+    if wStart is not None and wEnd is not None:
+        written = wEnd - wStart
+    size = checkpoint_bytes(run_dir)
+    if mode is not None and size == 0:
+        raise RuntimeError("Checkpoint mode " + str(mode) + " wrote an empty checkpoint in " + run_dir +
+                           " (is every app of workflow() in workflow_apps?)")
+
+    recovery = None
+    if mode is not None:
+        tLoad = time.perf_counter()
+        parsl.load(fresh_config(optimalCPW, checkpoint_mode=None,
+                                checkpoint_files=[os.path.join(run_dir, "checkpoint")]))
+        workflow()
+        recovery = time.perf_counter() - tLoad
+        parsl.dfk().cleanup()
+        parsl.clear()
+
+    checkpointResults.append([mode, str(mode) + ("" if period is None else " " + period), tEnd - tStart,
+                              size, written, recovery])
+
+if checkpointModes:
+    set_app_cache(False)
+
+    # The run without checkpointing, if there is one, is the baseline for overhead
+    baseTime = None
+    baseWritten = None
+    for mode, name, t, size, written, recovery in checkpointResults:
+        if mode is None:
+            baseTime = t
+            baseWritten = written
+
+    print()
+    print("Checkpointing (cores per worker: " + str(optimalCPW) + ")")
+    for mode, name, t, size, written, recovery in checkpointResults:
+        print("Mode: " + name)
+        if baseTime is not None:
+            print("Seconds: " + str(round(t, 2)) + " (" + str(round(t - baseTime, 2)) + " seconds, " +
+                  str(round((t / baseTime - 1) * 100, 2)) + "% overhead)")
+        else:
+            print("Seconds: " + str(round(t, 2)))
+        print("Checkpoint bytes: " + str(size))
+        if written is not None and baseWritten is not None:
+            print("Bytes written: " + str(written) + " (" + str(written - baseWritten) +
+                  " more than no checkpointing)")
+        elif written is not None:
+            print("Bytes written: " + str(written))
+        if recovery is not None:
+            print("Recovery seconds: " + str(round(recovery, 2)))
+        print(" ")
+
+    checkpointFile = "eepsCheckpoint.csv"
+    newFile = not os.path.exists(checkpointFile)
+    with open(checkpointFile, "a", newline="") as f:
+        writer = csv.writer(f)
+        if newFile:
+            writer.writerow(["date", "coresPerWorker", "mode", "time", "overhead", "checkpointBytes",
+                             "bytesWritten", "recovery"])
+        for mode, name, t, size, written, recovery in checkpointResults:
+            overhead = None
+            if baseTime is not None:
+                overhead = t - baseTime
+            writer.writerow([sweepDate, optimalCPW, name, t, overhead, size, written, recovery])
@@ -0,0 +1,291 @@
+# fusion.py - runs many small app calls as a few larger Parsl tasks
+# When apps finish in well under a second, sending each one to a worker costs about as much as running it,
+# and adding workers only makes the EEPS cost worse. A Fuser collects calls to small apps and submits them
+# in batches: each batch is one Parsl task that runs its calls one after another on the same worker.
+# Calls in a batch may depend on earlier calls of the same batch (a chain) or on any other future.
+#
+#     fuser = Fuser(batch_size=choose_batch_size(task_seconds=0.05, overhead_seconds=measure_overhead()))
+#     results = [fuser.call(app_I, x, 7) for x in range(100)]    # app_I can be a python_app or a plain function
+#     fuser.flush()                                              # submit the last, partly filled batch
+#     print([r.result() for r in results])
+#
+# A call only runs once its batch is submitted, so call flush() (or use "with Fuser(...) as fuser:")
+# before waiting on a result or on an app that depends on one.
+#
+# Run this file to compare the EEPS sweep's time and cost with fusion on and off:
+#     $ python fusion.py --tasks 200 --seconds 0.05
+import parsl
+from parsl import python_app
+from parsl.monitoring import MonitoringHub
+import matplotlib.pyplot as plt
+import numpy as np
+
+import multiprocessing
+
+import os
+import argparse
+import csv
+import datetime
+import math
+import dill
+from concurrent.futures import Future
+
+from parsl.providers import LocalProvider
+from parsl.channels import LocalChannel
+from parsl.launchers import SingleNodeLauncher
+
+from parsl.config import Config
+from parsl.executors import HighThroughputExecutor
+
+
+from parsl.data_provider.http import HTTPInTaskStaging
+from parsl.data_provider.ftp import FTPInTaskStaging
+from parsl.data_provider.file_noop import NoOpFileStaging
+
+import time
+
+
+# Calls are sent to the worker as a dill-serialized list of (function, args, kwargs), so functions defined
+# in a script travel by value. Every future argument is replaced by
+# ("dep", k): the k-th future passed to the batch task, which Parsl waits for and resolves, or
+# ("local", j): the result of call j earlier in the same batch
+
+@python_app(cache=False)
+def run_fused(calls, *deps):
+    import dill
+
+    def resolve(a, results):
+        if isinstance(a, tuple) and len(a) == 3 and a[0] == "__fused__":
+            if a[1] == "dep":
+                return deps[a[2]]
+            return results[a[2]]
+        return a
+
+    results = []
+    for func, args, kwargs in dill.loads(calls):
+        args = [resolve(a, results) for a in args]
+        kwargs = {k: resolve(v, results) for k, v in kwargs.items()}
+        results.append(func(*args, **kwargs))
+    return results
+
+
+class Fuser:
+    def __init__(self, batch_size=8):
+        self.batch_size = max(1, int(batch_size))
+        self.pending = []  # [(function, args, kwargs, Future)] not yet submitted
+        self.batches = 0
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+        return False
+
+    def call(self, app, *args, **kwargs):
+        # Queue one call of app (a python_app or a plain function), returning a Future for its result
+        func = getattr(app, "func", app)
+        future = Future()
+        self.pending.append((func, args, kwargs, future))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return future
+
+    def flush(self):
+        # Submit the queued calls as one Parsl task
+        if not self.pending:
+            return
+        batch = self.pending
+        self.pending = []
+        local = {id(f): j for j, (func, args, kwargs, f) in enumerate(batch)}
+        deps = []
+
+        def placeholder(a):
+            if isinstance(a, Future):
+                if id(a) in local:
+                    return ("__fused__", "local", local[id(a)])
+                deps.append(a)
+                return ("__fused__", "dep", len(deps) - 1)
+            return a
+
+        calls = []
+        for func, args, kwargs, f in batch:
+            calls.append((func, [placeholder(a) for a in args], {k: placeholder(v) for k, v in kwargs.items()}))
+        fused = run_fused(dill.dumps(calls), *deps)
+        self.batches += 1
+
+        def finish(fused_future):
+            try:
+                results = fused_future.result()
+            except Exception as e:
+                for func, args, kwargs, f in batch:
+                    f.set_exception(e)
+                return
+            for (func, args, kwargs, f), result in zip(batch, results):
+                f.set_result(result)
+
+        fused.add_done_callback(finish)
+        return
+
+
+# Measuring and choosing the batch size
+
+@python_app(cache=False)
+def noop():
+    return None
+
+
+def measure_overhead(n=20):
+    # Mean seconds to run one empty task, submitted one at a time, on the loaded config
+    noop().result()  # the first task also waits for a worker to start
+    tStart = time.perf_counter()
+    for i in range(n):
+        noop().result()
+    return (time.perf_counter() - tStart) / n
+
+
+def choose_batch_size(task_seconds, overhead_seconds, target=0.1, tasks=None, workers=None):
+    # Smallest batch whose overhead is at most target (a fraction) of its runtime,
+    # but not so large that there are fewer batches than workers
+    if task_seconds <= 0:
+        batch = 64
+    else:
+        batch = math.ceil(overhead_seconds * (1 - target) / (target * task_seconds))
+    if tasks is not None and workers is not None:
+        batch = min(batch, math.ceil(tasks / workers))
+    return max(1, batch)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compare the EEPS sweep with and without task fusion.")
+    parser.add_argument("--tasks", type=int, default=200, help="number of small tasks (default = %(default)s)")
+    parser.add_argument("--seconds", type=float, default=0.05,
+                        help="run time of each small task (default = %(default)s)")
+    parser.add_argument("--output", default="eepsFusion.csv", help="CSV file the results are appended to")
+    args = parser.parse_args()
+
+    # Loading list of cpw depending on the amount of cores in ones system (as in eeps.py)
+
+    cpw = []
+    cores = multiprocessing.cpu_count()
+    for j in range(1, cores+1):
+        cpw.append(cores / j)
+
+    working_dir = os.getcwd() + "/" + "test_htex_alternate"
+
+    # Same config as eeps.py
+
+    def fresh_config(cpw_input):
+        return Config(
+            executors=[
+                HighThroughputExecutor(
+                    label="htex_Local",
+                    working_dir=working_dir,
+                    storage_access=[FTPInTaskStaging(), HTTPInTaskStaging(), NoOpFileStaging()],
+                    worker_debug=True,
+                    cores_per_worker = cpw_input,
+                    heartbeat_period=2,
+                    heartbeat_threshold=5,
+                    poll_period=100,
+                    provider=LocalProvider(
+                        channel=LocalChannel(),
+                        init_blocks=0,
+                        min_blocks=0,
+                        max_blocks=1,
+                        launcher=SingleNodeLauncher(),
+                    ),
+                )
+            ],
+            strategy='simple',
+            app_cache=True, checkpoint_mode='task_exit',
+            retries=2,
+            monitoring=MonitoringHub(
+                            hub_address="localhost",
+                            hub_port=55055,
+                            monitoring_debug=False,
+                            resource_monitoring_interval=1,
+            )
+        )
+
+    # Fine-grained workload: chains of two small apps, like app_I feeding app_D
+
+    @python_app(cache=False)
+    def small_I(x, y, seconds):
+        import time
+        time.sleep(seconds)
+        return x * x - (3 - 4 * y)
+
+    @python_app(cache=False)
+    def small_D(a, b, seconds):
+        import time
+        time.sleep(seconds)
+        return a + b
+
+    def workload(call):
+        results = []
+        for n in range(args.tasks // 2):
+            results.append(call(small_D, call(small_I, n, 7, args.seconds), n, args.seconds))
+        return results
+
+    sweepDate = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    results = []
+
+    for i in range(len(cpw)):
+        workers = cores / cpw[i]
+        parsl.load(fresh_config(cpw[i]))
+        overhead = measure_overhead()
+
+        # Fusion off: every call is its own task
+        tStart = time.perf_counter()
+        [f.result() for f in workload(lambda app, *a: app(*a))]
+        offTime = time.perf_counter() - tStart
+
+        # Fusion on: calls are batched, chains stay in one batch when they fit
+        batch_size = choose_batch_size(args.seconds, overhead, tasks=args.tasks, workers=workers)
+        tStart = time.perf_counter()
+        with Fuser(batch_size) as fuser:
+            futures = workload(fuser.call)
+        [f.result() for f in futures]
+        onTime = time.perf_counter() - tStart
+
+        parsl.dfk().cleanup()
+        parsl.clear()
+
+        results.append([workers, cpw[i], overhead, batch_size, fuser.batches, offTime, offTime * workers,
+                        onTime, onTime * workers])
+        print("Workers: " + str(workers) + " (cores per worker: " + str(cpw[i]) + ")")
+        print("Overhead per task: " + str(round(overhead * 1000, 2)) + " ms, batch size: " + str(batch_size) +
+              " (" + str(fuser.batches) + " batches)")
+        print("Fusion off: " + str(round(offTime, 2)) + " seconds, " + str(round(offTime * workers, 2)) +
+              " core seconds")
+        print("Fusion on: " + str(round(onTime, 2)) + " seconds, " + str(round(onTime * workers, 2)) +
+              " core seconds")
+        print()
+
+    newFile = not os.path.exists(args.output)
+    with open(args.output, "a", newline="") as f:
+        writer = csv.writer(f)
+        if newFile:
+            writer.writerow(["date", "workers", "coresPerWorker", "overhead", "batchSize", "batches", "offTime",
+                             "offCost", "onTime", "onCost"])
+        for row in results:
+            writer.writerow([sweepDate] + row)
+    print("Results appended to " + args.output)
+
+    # Time and cost v. workers, with fusion off and on
+
+    workers = [row[0] for row in results]
+    w = 0.2
+    bar1 = np.arange(len(workers))
+    plt.bar(bar1, [row[6] for row in results], w, label="Cost (off)")
+    plt.bar(bar1 + w, [row[8] for row in results], w, label="Cost (on)")
+    plt.bar(bar1 + 2*w, [row[5] for row in results], w, label="Time (off)")
+    plt.bar(bar1 + 3*w, [row[7] for row in results], w, label="Time (on)")
+    plt.title("Cost and Time v. Workers, task fusion off and on")
+    plt.xticks(bar1 + 1.5*w, workers)
+    plt.xlabel('Workers')
+    plt.ylabel('Time(Seconds) or Cost(Core Seconds)')
+    plt.legend(loc="upper left")
+    plt.savefig('fusionCTvW.png')
@@ -0,0 +1,185 @@
+## latencyHarness.py - how long results take to reach an as_completed consumer
+##
+## Each task sleeps briefly and returns time.time() together with a payload of
+## the requested size.  Every result is timestamped at four points:
+##   worker    the app returns on the worker (its own clock; workers are local)
+##   client    the HTEX executor's future completes in this process, i.e. the
+##             result has come back through the interchange
+##   dfk       the AppFuture completes, after the DFK's result handling
+##   consumer  as_completed yields the future to the consuming loop
+## and delivery latency percentiles are reported for each stage as the number
+## of workers (cores per worker, as in eeps.py) and the payload size vary.
+## Monitoring is off so that it does not add traffic of its own.
+##
+##   $ python latencyHarness.py --payloads 0 1000 1000000 --tasks 200 -o latency.csv
+
+import sys, os
+import csv
+import time
+import datetime
+import argparse
+import multiprocessing
+from concurrent.futures import as_completed
+
+import numpy as np
+from tabulate import tabulate
+
+import parsl
+from parsl import python_app
+from parsl.config import Config
+from parsl.executors import HighThroughputExecutor
+from parsl.providers import LocalProvider
+from parsl.channels import LocalChannel
+from parsl.launchers import SingleNodeLauncher
+
+latencyStages = ['worker->client', 'client->dfk', 'dfk->consumer', 'worker->consumer']
+latencyPercentiles = [50, 90, 99, 100]
+
+
+@python_app(cache=False)
+def payloadApp(token, nbytes, sleep):
+    import time
+    time.sleep(sleep)
+    return (time.time(), b'x' * nbytes)
+
+
+def latencyConfig(cpw):
+    ## The executor settings of eeps.py (poll_period included, as it affects latency)
+    return Config(
+        executors=[
+            HighThroughputExecutor(
+                label='htex_Local',
+                cores_per_worker=cpw,
+                heartbeat_period=2,
+                heartbeat_threshold=5,
+                poll_period=100,
+                provider=LocalProvider(channel=LocalChannel(), init_blocks=1, min_blocks=0, max_blocks=1,
+                                       launcher=SingleNodeLauncher()),
+            )
+        ],
+        strategy='simple',
+        app_cache=False, checkpoint_mode=None,
+        retries=0,
+    )
+
+
+def timeClientSide(dfk, stamps):
+    ## Wrap each executor's submit so that the time its future completes
+    ## (the result is back from the interchange) is recorded under the task's token
+    for executor in dfk.executors.values():
+        submit = executor.submit
+
+        def timedSubmit(func, resource_specification, *args, submit=submit, **kwargs):
+            fut = submit(func, resource_specification, *args, **kwargs)
+            token = args[0] if args else None
+            fut.add_done_callback(lambda f: stamps.setdefault(token, time.time()))
+            return fut
+
+        executor.submit = timedSubmit
+        pass
+    return
+
+
+def timeDFKSide(fut, stamps, token):
+    ## Record the time the DFK completes the AppFuture under token.  A done
+    ## callback is not enough: Future.set_result wakes as_completed before it
+    ## runs callbacks, so the stamp is taken in set_result itself.
+    setResult = fut.set_result
+
+    def timedSetResult(result):
+        stamps.setdefault(token, time.time())
+        setResult(result)
+
+    fut.set_result = timedSetResult
+    return
+
+
+def latencyRun(ntasks, nbytes, sleep):
+    ## Run ntasks on the loaded DFK, returning ({stage:array of latencies in seconds}, #skipped).
+    ## Results without a DFK stamp taken before the consumer saw them (the
+    ## task finished before its AppFuture was wrapped) are skipped.
+    clientStamps = {}
+    dfkStamps = {}
+    timeClientSide(parsl.dfk(), clientStamps)
+    payloadApp(-1, 0, 0).result()  # wait for the workers to start
+
+    futures = {}
+    rng = np.random.default_rng(0)
+    for token in range(ntasks):
+        fut = payloadApp(token, nbytes, float(rng.uniform(0, 2 * sleep)))
+        timeDFKSide(fut, dfkStamps, token)
+        futures[fut] = token
+        pass
+    lat = {stage: [] for stage in latencyStages}
+    skipped = 0
+    for fut in as_completed(futures):
+        tConsumer = time.time()
+        (tWorker, payload) = fut.result()
+        token = futures[fut]
+        tClient = clientStamps.get(token)
+        tDFK = dfkStamps.get(token)
+        if tClient is None or tDFK is None or tDFK > tConsumer:
+            skipped += 1
+            continue
+        lat['worker->client'].append(tClient - tWorker)
+        lat['client->dfk'].append(tDFK - tClient)
+        lat['dfk->consumer'].append(tConsumer - tDFK)
+        lat['worker->consumer'].append(tConsumer - tWorker)
+        pass
+    return ({stage: np.array(values) for (stage, values) in lat.items()}, skipped)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Result delivery latency for as_completed consumers.')
+    parser.add_argument('--payloads', type=int, nargs='+', default=[0, 1000, 100000, 1000000],
+                        help='result payload sizes in bytes (default = %(default)s)')
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='worker counts (default = 1, 2, 4, ... up to the number of cores)')
+    parser.add_argument('--tasks', type=int, default=200, help='tasks per measurement (default = %(default)s)')
+    parser.add_argument('--sleep', type=float, default=0.02,
+                        help='mean task run time in seconds (default = %(default)s)')
+    parser.add_argument('-o', '--output', default=None, help='append results to this CSV file')
+    args = parser.parse_args()
+
+    cores = multiprocessing.cpu_count()
+    workers = args.workers
+    if workers is None: workers = [2 ** k for k in range(cores.bit_length()) if 2 ** k <= cores]
+
+    rows = []
+    for w in workers:
+        for nbytes in args.payloads:
+            parsl.load(latencyConfig(cores / w))
+            (lat, skipped) = latencyRun(args.tasks, nbytes, args.sleep)
+            parsl.dfk().cleanup()
+            parsl.clear()
+            for stage in latencyStages:
+                if len(lat[stage]) == 0: continue
+                rows.append([w, nbytes, stage, len(lat[stage])] +
+                            [1000. * np.percentile(lat[stage], p) for p in latencyPercentiles])
+                pass
+            if len(lat['worker->consumer']) == 0:
+                print(f'%WARNING: {w} workers, {nbytes} byte payloads: all {skipped} results skipped (no timestamps)')
+                continue
+            print(f'{w} workers, {nbytes} byte payloads: worker->consumer p50 '
+                  f'{1000. * np.median(lat["worker->consumer"]):.2f} ms'
+                  + (f' ({skipped} results without timestamps skipped)' if skipped else ''))
+            pass
+        pass
+
+    print(f'\nDelivery latency in ms')
+    headers = ['workers', 'payload bytes', 'stage', '#tasks'] + [f'p{p}' for p in latencyPercentiles[:-1]] + ['max']
+    print(tabulate(rows, headers=headers, tablefmt='grid', floatfmt='.2f'))
+
+    if args.output is not None:
+        newFile = not os.path.exists(args.output)
+        with open(args.output, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if newFile: writer.writerow(['date'] + headers)
+            date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for row in rows:
+                writer.writerow([date] + row)
+                pass
+            pass
+        print(f'Results appended to {args.output}')
+        pass
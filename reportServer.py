@@ -0,0 +1,178 @@
+## reportServer.py - serve dbAnalysis.py reports from a long-running process
+##
+## One read-only pmon object is kept open for the life of the server, so the
+## connection, views, workflow table and task tallies are set up once rather
+## than on every poll.  Rendered reports are cached and the cache is dropped
+## only when sqlite's data_version shows that another connection (normally
+## the MonitoringHub) has committed new data.
+##
+## Loopback HTTP (the report name is the path, options are query parameters):
+##   $ python reportServer.py -f monitoring.db -p 8765
+##   $ curl 'http://127.0.0.1:8765/shortSummary?runnum=2'
+##
+## Unix socket (one request line per connection, "<report> [name=value ...]"):
+##   $ python reportServer.py -f monitoring.db -U /tmp/pmon.sock
+##   $ echo 'waits runnum=2' | nc -U /tmp/pmon.sock
+
+import sys, os
+import io
+import argparse
+import contextlib
+import datetime
+import socketserver
+import http.server
+import urllib.parse
+import signal
+
+import dbAnalysis
+
+## Reports that may be requested, and the pmon method that produces each one.
+## Request options are passed to the method as keyword arguments.
+serverReports = {
+    'shortSummary': lambda m, **kw: m.shortSummary(**dict({'limit': 5}, **kw)),
+    'taskSummary': lambda m, **kw: m.taskSummary(**kw),
+    'nctaskSummary': lambda m, **kw: m.nctaskSummary(**kw),
+    'runHistory': lambda m, **kw: m.runHistory(**kw),
+    'recentStatus': lambda m, **kw: m.recentStatus(**kw),
+    'resources': lambda m, **kw: m.resourceReport(**kw),
+    'workers': lambda m, **kw: m.workerReport(**kw),
+    'waits': lambda m, **kw: m.waitReport(**kw),
+    'diff': lambda m, **kw: m.runDiff(**kw),
+    'stragglers': lambda m, **kw: m.stragglerReport(**kw),
+    'cache': lambda m, **kw: m.cacheReport(**kw),
+}
+
+
+class reportCache:
+    ### class reportCache - render pmon reports, caching them until the database changes
+    def __init__(self, dbfile, debug=0):
+        self.debug = debug
+        self.m = dbAnalysis.pmon(dbfile=dbfile, debug=debug, readonly=True)
+        ## The server takes a fresh snapshot per request (see render)
+        self.m.endSnapshot()
+        self.version = self.m.dataVersion()
+        self.cache = {}  # {(report,options):text}
+        self.hits = 0
+        self.misses = 0
+        return
+
+    def render(self, report, options):
+        ## Return (ok, text) for one report request
+        if report not in serverReports:
+            return (False, f'%ERROR: unknown report {report}, must be one of {list(serverReports.keys())}\n')
+        kwargs = {}
+        for (name, value) in options.items():
+            try:
+                kwargs[name] = int(value)
+            except ValueError:
+                kwargs[name] = value
+                pass
+            pass
+
+        version = self.m.dataVersion()
+        if version != self.version:
+            if self.debug > 0: print(f'data_version {self.version} -> {version}, clearing {len(self.cache)} reports')
+            self.cache = {}
+            self.m.refresh()
+            self.version = version
+            pass
+
+        key = (report, tuple(sorted(kwargs.items())))
+        if key in self.cache:
+            self.hits += 1
+            return (True, self.cache[key])
+        self.misses += 1
+
+        ## Reports add onto the task tallies and reuse the task table of the
+        ## previous report, so each one starts from scratch
+        out = io.StringIO()
+        self.m.resetTaskData()
+        self.m.beginSnapshot()
+        try:
+            with contextlib.redirect_stdout(out):
+                serverReports[report](self.m, **kwargs)
+        except TypeError as e:
+            return (False, f'%ERROR: bad options for {report}: {e}\n')
+        except SystemExit as e:
+            ## Reports exit on bad input; that must not stop the server
+            return (False, out.getvalue() + f'%ERROR: {report} stopped (exit status {e.code})\n')
+        except Exception as e:
+            return (False, out.getvalue() + f'%ERROR: {report} failed: {type(e).__name__}: {e}\n')
+        finally:
+            self.m.endSnapshot()
+        self.cache[key] = out.getvalue()
+        return (True, self.cache[key])
+
+
+class httpHandler(http.server.BaseHTTPRequestHandler):
+    ### class httpHandler - GET /<report>?name=value... returns the report as text
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        report = url.path.strip('/') or 'shortSummary'
+        options = dict(urllib.parse.parse_qsl(url.query))
+        (ok, text) = self.server.reports.render(report, options)
+        body = text.encode()
+        self.send_response(200 if ok else 400)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return
+
+    def log_message(self, format, *args):
+        if self.server.reports.debug > 0: super().log_message(format, *args)
+        return
+
+
+class socketHandler(socketserver.StreamRequestHandler):
+    ### class socketHandler - read "<report> [name=value ...]", write the report, close
+    def handle(self):
+        words = self.rfile.readline().decode().split()
+        if len(words) == 0: return
+        options = dict(word.split('=', 1) for word in words[1:] if '=' in word)
+        (ok, text) = self.server.reports.render(words[0], options)
+        self.wfile.write(text.encode())
+        return
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Serve dbAnalysis.py reports from one long-running process. '
+                                                 'Available reports: ' + str(list(serverReports.keys())))
+    parser.add_argument('-f', '--file', default='./monitoring.db',
+                        help='name of Parsl monitoring database file (default=%(default)s)')
+    parser.add_argument('-p', '--port', type=int, default=8765,
+                        help='loopback HTTP port (default = %(default)s)')
+    parser.add_argument('-U', '--socket', default=None, help='serve on this Unix socket instead of HTTP')
+    parser.add_argument('-d', '--debug', type=int, default=0, help='Set debug level (default = %(default)s)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print("%ERROR: monitoring database file not found, ", args.file)
+        sys.exit(1)
+
+    ## Requests are handled one at a time: the sqlite connection belongs to this thread
+    if args.socket is not None:
+        if os.path.exists(args.socket): os.remove(args.socket)
+        server = socketserver.UnixStreamServer(args.socket, socketHandler)
+        where = args.socket
+    else:
+        server = http.server.HTTPServer(('127.0.0.1', args.port), httpHandler)
+        where = f'http://127.0.0.1:{args.port}/'
+        pass
+    server.reports = reportCache(args.file, debug=args.debug)
+
+    ## Stop cleanly (removing the socket file) on kill as well as ^C
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, stop)
+    print(f'{datetime.datetime.now()} serving {args.file} on {where}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket is not None and os.path.exists(args.socket): os.remove(args.socket)
+        print(f'Served {server.reports.hits} cached and {server.reports.misses} rendered reports')
+    pass
@@ -0,0 +1,209 @@
+# stagingBench.py - measures how much moving files costs, for each number of workers
+# The benchmark apps read an input file and write an output file of the same size
+# Each batch of apps is run twice: with file:// inputs (no staging) and with http:// inputs
+# served by a local stand-in HTTP server (staged into the task by HTTPInTaskStaging)
+# The difference between the two is the staging time, reported as throughput and as a share of the runtime
+#
+#   $ python stagingBench.py --sizes 1 16 64 --count 8
+import parsl
+from parsl import python_app
+from parsl.data.files import File
+from parsl.monitoring import MonitoringHub
+
+import multiprocessing
+
+import os
+import argparse
+import csv
+import datetime
+import functools
+import shutil
+import threading
+import http.server
+
+from parsl.providers import LocalProvider
+from parsl.channels import LocalChannel
+from parsl.launchers import SingleNodeLauncher
+
+from parsl.config import Config
+from parsl.executors import HighThroughputExecutor
+
+
+from parsl.data_provider.http import HTTPInTaskStaging
+from parsl.data_provider.ftp import FTPInTaskStaging
+from parsl.data_provider.file_noop import NoOpFileStaging
+
+import time
+
+
+parser = argparse.ArgumentParser(description="File staging throughput benchmark for the EEPS staging providers.")
+parser.add_argument("--sizes", type=float, nargs="+", default=[1, 16, 64],
+                    help="file sizes in MB (default = %(default)s)")
+parser.add_argument("--count", type=int, default=8, help="files of each size (default = %(default)s)")
+parser.add_argument("--workers", type=int, nargs="+", default=None,
+                    help="worker counts to test (default = 1 to the number of cores)")
+parser.add_argument("--output", default="eepsStaging.csv", help="CSV file the results are appended to")
+args = parser.parse_args()
+
+
+# Loading list of cpw depending on the amount of cores in ones system (as in eeps.py)
+
+cores = multiprocessing.cpu_count()
+
+workers = args.workers
+if workers is None:
+    workers = list(range(1, cores+1))
+cpw = [cores / w for w in workers]
+
+working_dir = os.getcwd() + "/" + "test_htex_alternate"
+data_dir = os.path.abspath("staging_bench")
+
+
+# Same config as eeps.py
+
+def fresh_config(cpw_input):
+    return Config(
+        executors=[
+            HighThroughputExecutor(
+                label="htex_Local",
+                working_dir=working_dir,
+                storage_access=[FTPInTaskStaging(), HTTPInTaskStaging(), NoOpFileStaging()],
+                worker_debug=True,
+                cores_per_worker = cpw_input,
+                heartbeat_period=2,
+                heartbeat_threshold=5,
+                poll_period=100,
+                provider=LocalProvider(
+                    channel=LocalChannel(),
+                    init_blocks=0,
+                    min_blocks=0,
+                    max_blocks=1,
+                    launcher=SingleNodeLauncher(),
+                ),
+            )
+        ],
+        strategy='simple',
+        app_cache=True, checkpoint_mode='task_exit',
+        retries=2,
+        monitoring=MonitoringHub(
+                        hub_address="localhost",
+                        hub_port=55055,
+                        monitoring_debug=False,
+                        resource_monitoring_interval=1,
+        )
+    )
+
+
+# File-in/file-out app
+# cache=False so that repeated batches are really run
+
+@python_app(cache=False)
+def process_file(inputs=[], outputs=[]):
+    import hashlib
+    h = hashlib.md5()
+    with open(inputs[0].filepath, "rb") as fin, open(outputs[0].filepath, "wb") as fout:
+        while True:
+            chunk = fin.read(1 << 20)
+            if not chunk:
+                break
+            h.update(chunk)
+            fout.write(chunk)
+    return h.hexdigest()
+
+
+# Input files, written once
+
+def make_inputs():
+    os.makedirs(os.path.join(data_dir, "in"), exist_ok=True)
+    names = []
+    for size in args.sizes:
+        for n in range(args.count):
+            name = "in_" + str(size) + "MB_" + str(n)
+            path = os.path.join(data_dir, "in", name)
+            nbytes = int(size * 1024 * 1024)
+            if not os.path.exists(path) or os.path.getsize(path) != nbytes:
+                with open(path, "wb") as f:
+                    left = nbytes
+                    while left > 0:
+                        f.write(os.urandom(min(left, 1 << 20)))
+                        left -= 1 << 20
+            names.append((name, size, nbytes))
+    return names
+
+
+# Loopback HTTP server standing in for a remote data source
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server():
+    handler = functools.partial(QuietHandler, directory=os.path.join(data_dir, "in"))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Run one batch: every input file through process_file, returning the seconds it took
+
+def run_batch(names, url):
+    out_dir = os.path.join(data_dir, "out")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    tStart = time.perf_counter()
+    futures = []
+    for name, size, nbytes in names:
+        futures.append(process_file(inputs=[File(url + "/" + name)],
+                                    outputs=[File("file://" + os.path.join(out_dir, name))]))
+    for f in futures:
+        f.result()
+    return time.perf_counter() - tStart
+
+
+names = make_inputs()
+server = start_server()
+http_url = "http://127.0.0.1:" + str(server.server_address[1])
+file_url = "file://" + os.path.join(data_dir, "in")
+total_bytes = sum(nbytes for name, size, nbytes in names)
+
+results = []
+sweepDate = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+for i in range(len(cpw)):
+    parsl.load(fresh_config(cpw[i]))
+    # A first small batch starts the workers, so neither timed batch pays for that
+    run_batch(names[:1], file_url)
+    localTime = run_batch(names, file_url)
+    httpTime = run_batch(names, http_url)
+    parsl.dfk().cleanup()
+    parsl.clear()
+
+    stagingTime = max(httpTime - localTime, 0)
+    throughput = None
+    if stagingTime > 0:
+        throughput = total_bytes / stagingTime / 1e6
+    share = stagingTime / httpTime * 100
+    results.append([workers[i], cpw[i], len(names), total_bytes, localTime, httpTime, stagingTime, throughput, share])
+
+    print("Workers: " + str(workers[i]) + " (cores per worker: " + str(cpw[i]) + ")")
+    print("Files: " + str(len(names)) + ", MB: " + str(round(total_bytes / 1e6, 2)))
+    print("Seconds with file:// inputs: " + str(round(localTime, 2)))
+    print("Seconds with http:// inputs: " + str(round(httpTime, 2)))
+    print("Staging seconds: " + str(round(stagingTime, 2)) + " (" + str(round(share, 2)) + "% of runtime)")
+    if throughput is not None:
+        print("Staging throughput: " + str(round(throughput, 2)) + " MB/s")
+    print()
+
+server.shutdown()
+shutil.rmtree(os.path.join(data_dir, "out"), ignore_errors=True)
+
+newFile = not os.path.exists(args.output)
+with open(args.output, "a", newline="") as f:
+    writer = csv.writer(f)
+    if newFile:
+        writer.writerow(["date", "workers", "coresPerWorker", "files", "bytes", "localTime", "httpTime",
+                         "stagingTime", "throughputMBps", "stagingPct"])
+    for row in results:
+        writer.writerow([sweepDate] + row)
+print("Results appended to " + args.output)
@@ -0,0 +1,96 @@
+## startupBench.py - measure how quickly each dbAnalysis.py report starts producing output
+##
+## Each report is run as a fresh process (as from cron or a shell loop) and
+## timed from process launch to its first line of report output (the
+## version banner is skipped) and to process exit.  Results can be appended
+## to a CSV file to track startup time across changes.
+##
+##   $ python startupBench.py -f monitoring.db -n 5 -o startupBench.csv
+
+import sys, os
+import subprocess
+import time
+import datetime
+import argparse
+import statistics
+import csv
+
+## Reports (and any extra arguments they need) timed by default
+benchReports = {
+    'shortSummary': [],
+    'taskSummary': [],
+    'taskHistory': ['-t', '1'],
+    'nctaskSummary': [],
+    'runHistory': [],
+    'recentStatus': [],
+}
+
+dbAnalysis = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'dbAnalysis.py')
+
+
+def timeReport(report, dbfile, extra=[]):
+    ## Run one report, returning (seconds to first report line, seconds to exit)
+    ## The banner printed by dbAnalysis.py ends with the first empty line.
+    cmd = [sys.executable, dbAnalysis, report, '-f', dbfile] + extra
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env, text=True)
+    tFirst = None
+    inBanner = True
+    for line in proc.stdout:
+        if inBanner:
+            if line.strip() == '': inBanner = False
+            continue
+        if tFirst is None: tFirst = time.perf_counter() - t0
+        pass
+    proc.wait()
+    tEnd = time.perf_counter() - t0
+    if proc.returncode != 0: print(f'%WARNING: {report} exited with status {proc.returncode}')
+    if tFirst is None: tFirst = tEnd
+    return (tFirst, tEnd)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Time-to-first-output benchmark for dbAnalysis.py reports.')
+    parser.add_argument('-f', '--file', default='./monitoring.db',
+                        help='name of Parsl monitoring database file (default=%(default)s)')
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='runs per report (default = %(default)s)')
+    parser.add_argument('-r', '--reports', nargs='+', default=list(benchReports.keys()),
+                        help='reports to time (default = %(default)s)')
+    parser.add_argument('-o', '--output', default=None, help='append results to this CSV file')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print("%ERROR: monitoring database file not found, ", args.file)
+        sys.exit(1)
+
+    ## Warm the OS file cache so the first report is not penalized
+    timeReport('runHistory', args.file)
+
+    results = []
+    for report in args.reports:
+        firsts = []
+        totals = []
+        for n in range(args.repeat):
+            (tFirst, tEnd) = timeReport(report, args.file, benchReports.get(report, []))
+            firsts.append(tFirst)
+            totals.append(tEnd)
+            pass
+        results.append([report, statistics.median(firsts), min(firsts), statistics.median(totals), min(totals)])
+        print(f'{report:15s} first output {results[-1][1]:.3f} s (min {results[-1][2]:.3f}), '
+              f'exit {results[-1][3]:.3f} s (min {results[-1][4]:.3f})')
+        pass
+
+    if args.output is not None:
+        newFile = not os.path.exists(args.output)
+        with open(args.output, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if newFile: writer.writerow(['date', 'report', 'firstOutput', 'minFirstOutput', 'total', 'minTotal'])
+            date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for row in results:
+                writer.writerow([date] + row)
+                pass
+            pass
+        print(f'Results appended to {args.output}')
+        pass
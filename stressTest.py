@@ -0,0 +1,186 @@
+## stressTest.py - find where the Parsl DataFlowKernel itself becomes the bottleneck
+##
+## Submits large numbers of trivial tasks in three DAG shapes:
+##   flat   N independent tasks
+##   chain  one chain of N tasks, each depending on the previous one
+##   fanin  N tasks gathered by wide fan-in tasks (--width dependencies each),
+##          which are gathered by one final task
+## Every first-level task also depends on a "gate" future, so nothing can run
+## while the DAG is submitted.  For each shape and size this measures
+##   submit rate     tasks submitted per second
+##   memory/task     growth of the process RSS per pending task
+##   resolve time    gate release until the last task's done-callback, per
+##                   task (for chain: the latency of one dependency link)
+##   collect rate    tasks per second yielded by as_completed, consumed
+##                   from gate release while results are still arriving
+## By default tasks run in a ThreadPoolExecutor, so the numbers reflect the
+## DFK rather than HTEX's interchange; use --executor htex for the EEPS setup.
+##
+##   $ python stressTest.py --sizes 10000 100000 1000000 -o stressTest.csv
+
+import sys, os
+import gc
+import threading
+import csv
+import time
+import datetime
+import argparse
+import multiprocessing
+from concurrent.futures import Future, as_completed
+
+import parsl
+from parsl import python_app
+from parsl.config import Config
+from parsl.executors import ThreadPoolExecutor, HighThroughputExecutor
+from parsl.providers import LocalProvider
+from parsl.channels import LocalChannel
+from parsl.launchers import SingleNodeLauncher
+
+stressShapes = ['flat', 'chain', 'fanin']
+
+
+@python_app(cache=False)
+def noop(*deps):
+    return 1
+
+
+@python_app(cache=False)
+def gather(*values):
+    return sum(values)
+
+
+def residentBytes():
+    ## Current resident set size of this process
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak, not current, off Linux
+
+
+def stressConfig(executor, workers):
+    ## No monitoring and no checkpointing: only the DFK and executor are measured
+    if executor == 'htex':
+        ex = HighThroughputExecutor(label='htex_Local', max_workers=workers,
+                                    provider=LocalProvider(channel=LocalChannel(), init_blocks=1, max_blocks=1,
+                                                           launcher=SingleNodeLauncher()))
+    else:
+        ex = ThreadPoolExecutor(label='threads', max_threads=workers)
+        pass
+    return Config(executors=[ex], app_cache=False, checkpoint_mode=None, retries=0)
+
+
+def submit(shape, n, gate, width):
+    ## Submit one DAG, returning the list of all its futures
+    futures = []
+    if shape == 'flat':
+        for i in range(n):
+            futures.append(noop(gate))
+            pass
+    elif shape == 'chain':
+        prev = gate
+        for i in range(n):
+            prev = noop(prev)
+            futures.append(prev)
+            pass
+    elif shape == 'fanin':
+        groups = []
+        for start in range(0, n, width):
+            leaves = [noop(gate) for i in range(start, min(n, start + width))]
+            futures += leaves
+            groups.append(gather(*leaves))
+            pass
+        futures += groups
+        futures.append(gather(*groups))
+        pass
+    return futures
+
+
+def stressRun(shape, n, width):
+    ## Submit, release and collect one DAG on the loaded DFK
+    gc.collect()
+    rss0 = residentBytes()
+    gate = Future()
+    t0 = time.perf_counter()
+    futures = submit(shape, n, gate, width)
+    tSubmit = time.perf_counter() - t0
+    gc.collect()
+    rss1 = residentBytes()
+
+    ## Resolution and collection are measured over the same run, from gate release:
+    ##   resolution   until the last future's done-callback
+    ##   collection   until as_completed, consumed live, yields the last future
+    ## Callbacks run after as_completed is woken, so wait for all of them
+    doneStamps = []
+    allDone = threading.Event()
+
+    def stamp(f):
+        doneStamps.append(time.perf_counter())
+        if len(doneStamps) == len(futures): allDone.set()
+        return
+
+    for f in futures:
+        f.add_done_callback(stamp)
+        pass
+    t1 = time.perf_counter()
+    gate.set_result(0)
+    collected = 0
+    tYield = t1
+    for f in as_completed(futures):
+        f.result()
+        tYield = time.perf_counter()
+        collected += 1
+        pass
+    tCollect = tYield - t1
+    allDone.wait()
+    tResolve = max(doneStamps) - t1
+    return {'tasks': len(futures), 'submitRate': len(futures) / tSubmit,
+            'bytesPerTask': (rss1 - rss0) / len(futures), 'resolvePerTask': tResolve / len(futures),
+            'collectRate': collected / tCollect, 'submitTime': tSubmit, 'resolveTime': tResolve}
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Parsl DFK submission stress benchmark.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                        help='number of tasks per DAG (default = %(default)s)')
+    parser.add_argument('--shapes', nargs='+', choices=stressShapes, default=stressShapes,
+                        help='DAG shapes (default = %(default)s)')
+    parser.add_argument('--width', type=int, default=1000,
+                        help='dependencies per fan-in task (default = %(default)s)')
+    parser.add_argument('--executor', choices=['threads', 'htex'], default='threads',
+                        help='executor running the tasks (default = %(default)s)')
+    parser.add_argument('-w', '--workers', type=int, default=multiprocessing.cpu_count(),
+                        help='threads or workers (default = %(default)s)')
+    parser.add_argument('-o', '--output', default=None, help='append results to this CSV file')
+    args = parser.parse_args()
+
+    results = []
+    for shape in args.shapes:
+        for n in args.sizes:
+            parsl.load(stressConfig(args.executor, args.workers))
+            r = stressRun(shape, n, args.width)
+            parsl.dfk().cleanup()
+            parsl.clear()
+            results.append([shape, n, r['tasks'], r['submitRate'], r['bytesPerTask'], r['resolvePerTask'],
+                            r['collectRate'], r['submitTime'], r['resolveTime']])
+            print(f'{shape:6s} {n:>8d}: submit {r["submitRate"]:9.0f} tasks/s, {r["bytesPerTask"]:7.0f} bytes/task, '
+                  f'resolve {1e6 * r["resolvePerTask"]:8.1f} us/task, collect {r["collectRate"]:9.0f} tasks/s')
+            pass
+        pass
+
+    if args.output is not None:
+        newFile = not os.path.exists(args.output)
+        with open(args.output, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if newFile: writer.writerow(['date', 'executor', 'workers', 'shape', 'size', 'tasks', 'submitRate',
+                                         'bytesPerTask', 'resolvePerTask', 'collectRate', 'submitTime',
+                                         'resolveTime'])
+            date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for row in results:
+                writer.writerow([date, args.executor, args.workers] + row)
+                pass
+            pass
+        print(f'Results appended to {args.output}')
+        pass
@@ -0,0 +1,326 @@
+## sweepAnalysis.py - fit scaling laws to EEPS sweep results and extrapolate
+##
+## eeps.py appends the time and cost measured for each worker count to
+## eepsResults.csv.  This fits two models of run time T(N) on N workers,
+##
+##   Amdahl's law:                 T(N) = T1 * (1 + s*(N-1)) / N
+##   Universal Scalability Law:    T(N) = T1 * (1 + sigma*(N-1) + kappa*N*(N-1)) / N
+##
+## (s, sigma = serial/contention fraction, kappa = coherency cost), reports
+## how well each fits, and predicts time and cost (core seconds = time x
+## workers, as in eeps.py) for worker counts beyond those measured.
+##
+## Both models are linear in (T1, T1*sigma, T1*kappa), so they are fitted
+## by least squares on T directly, keeping every coefficient non-negative.
+##
+## Given a price list and constraints, it also recommends a worker count:
+## each worker gets one core and memPerWorker GB, the instance is billed
+## per core-hour and GB-hour in whole billing increments, and measured
+## times are used where available, the best fitting model elsewhere.
+##
+##   $ python sweepAnalysis.py eepsResults.csv -w 32 64 128
+##   $ python sweepAnalysis.py runinfo/ --plot scaling.png   (monitoring databases)
+##   $ python sweepAnalysis.py --corePrice 0.04 --gbPrice 0.005 --billing 3600 --deadline 60 --budget 0.5
+
+import sys, os
+import csv
+import argparse
+import itertools
+
+import numpy as np
+from tabulate import tabulate
+
+## Models: name and which of (T1, T1*sigma, T1*kappa) are free
+scalingModels = {
+    'Amdahl': [True, True, False],
+    'USL': [True, True, True],
+}
+
+
+def loadCSV(filename):
+    ## Read (workers, time) points from an eeps.py results file
+    points = []
+    with open(filename, newline='') as f:
+        for row in csv.DictReader(f):
+            points.append((float(row['workers']), float(row['time'])))
+            pass
+        pass
+    return points
+
+
+def loadDatabases(paths):
+    ## Read (workers, time) points, one per completed run, from monitoring databases
+    import dbAnalysis
+    points = []
+    for dbfile in dbAnalysis.findDBfiles(paths):
+        agg = dbAnalysis.runAggregates(dbfile)
+        if agg['error'] is not None:
+            print(f'%WARNING: skipping {dbfile}: {agg["error"]}')
+            continue
+        for run in agg['runs']:
+            if run['workers'] and run['elapsed'] is not None: points.append((float(run['workers']), run['elapsed']))
+            pass
+        pass
+    return points
+
+
+def loadSweep(paths):
+    ## Return arrays (workers, mean time) over all inputs, one entry per worker count
+    points = []
+    for path in paths:
+        if path.endswith('.csv'):
+            points += loadCSV(path)
+        else:
+            points += loadDatabases([path])
+            pass
+        pass
+    byWorkers = {}
+    for (workers, time) in points:
+        byWorkers.setdefault(workers, []).append(time)
+        pass
+    N = np.array(sorted(byWorkers))
+    T = np.array([np.mean(byWorkers[n]) for n in N])
+    return (N, T)
+
+
+def modelTerms(N):
+    ## Columns multiplying (T1, T1*sigma, T1*kappa) in T(N)
+    N = np.asarray(N, dtype=float)
+    return np.column_stack([1. / N, (N - 1.) / N, N - 1.])
+
+
+def predict(fit, N):
+    ## Model run time at N workers
+    return modelTerms(N) @ (fit['T1'] * np.array([1., fit['sigma'], fit['kappa']]))
+
+
+def fitModel(N, T, free):
+    ## Non-negative least-squares fit of T(N); free = [T1, sigma, kappa] flags.
+    ##   Each subset of the free coefficients is solved exactly and the best
+    ##   solution with no negative coefficient is kept.
+    A = modelTerms(N)
+    best = None
+    optional = [i for i in [1, 2] if free[i]]
+    for k in range(len(optional) + 1):
+        for subset in itertools.combinations(optional, k):
+            cols = [0] + list(subset)
+            if len(cols) > len(N): continue
+            (c, *rest) = np.linalg.lstsq(A[:, cols], T, rcond=None)
+            if np.any(c < 0): continue
+            coef = np.zeros(3)
+            coef[cols] = c
+            sse = float(np.sum((A @ coef - T) ** 2))
+            if best is None or sse < best[0]: best = (sse, coef)
+            pass
+        pass
+    if best is None: return None
+    (sse, coef) = best
+    fit = {'T1': coef[0], 'sigma': coef[1] / coef[0], 'kappa': coef[2] / coef[0]}
+    model = predict(fit, N)
+    sst = float(np.sum((T - np.mean(T)) ** 2))
+    fit['r2'] = 1. - sse / sst if sst > 0 else 1.
+    fit['rmsPct'] = 100. * float(np.sqrt(np.mean(((model - T) / T) ** 2)))
+    fit['peak'] = None  # worker count of minimum run time (USL only)
+    if fit['kappa'] > 0: fit['peak'] = np.sqrt((1. - fit['sigma']) / fit['kappa']) if fit['sigma'] < 1 else 1.
+    return fit
+
+
+def fitSweep(N, T):
+    ## Fit every scaling model, {name:fit}
+    fits = {}
+    for (name, free) in scalingModels.items():
+        fit = fitModel(N, T, free)
+        if fit is not None: fits[name] = fit
+        pass
+    return fits
+
+
+def instancePrice(workers, seconds, pricing, memPerWorker):
+    ## Price of running for seconds on an instance with one core and
+    ## memPerWorker GB per worker.  pricing = {'core':per core-hour,
+    ## 'gb':per GB-hour, 'increment':billing increment (s), 'minimum':minimum billed (s)}
+    billed = max(seconds, pricing.get('minimum', 0.))
+    increment = pricing.get('increment', 0.)
+    if increment > 0: billed = np.ceil(billed / increment) * increment
+    return billed / 3600. * workers * (pricing.get('core', 0.) + memPerWorker * pricing.get('gb', 0.))
+
+
+def candidates(N, T, fits, maxWorkers):
+    ## [(workers, time, source)]: measured worker counts, and every other
+    ## count up to maxWorkers predicted by the best fitting model
+    rows = [(float(n), float(t), 'measured') for (n, t) in zip(N, T)]
+    if fits:
+        (name, fit) = min(fits.items(), key=lambda item: item[1]['rmsPct'])
+        for n in range(1, int(maxWorkers) + 1):
+            if n not in N: rows.append((float(n), float(predict(fit, [n])[0]), name))
+            pass
+        pass
+    return sorted(rows)
+
+
+def recommend(N, T, pricing, constraints=None, fits=None, maxWorkers=None, memPerWorker=2.,
+              objective='price', timeScale=1.):
+    ## Best worker count for a price list and constraints, or None if none qualifies.
+    ##   constraints = {'deadline':s, 'budget':price, 'ram':GB} (any may be missing)
+    ##   objective = 'price' (cheapest meeting the deadline) or 'time' (fastest within budget)
+    ##   timeScale multiplies every time (used by sensitivity)
+    constraints = constraints or {}
+    if maxWorkers is None: maxWorkers = 4 * max(N)
+    best = None
+    for (n, t, source) in candidates(N, T, fits, maxWorkers):
+        t *= timeScale
+        price = instancePrice(n, t, pricing, memPerWorker)
+        ram = n * memPerWorker
+        if constraints.get('deadline') is not None and t > constraints['deadline']: continue
+        if constraints.get('budget') is not None and price > constraints['budget']: continue
+        if constraints.get('ram') is not None and ram > constraints['ram']: continue
+        key = (price, t) if objective == 'price' else (t, price)
+        if best is None or key < best[0]:
+            best = (key, {'workers': n, 'coresPerWorker': 1, 'cores': n, 'ram': ram, 'time': t, 'price': price,
+                          'source': source})
+            pass
+        pass
+    return None if best is None else best[1]
+
+
+def sensitivity(N, T, pricing, constraints=None, fits=None, maxWorkers=None, memPerWorker=2., objective='price',
+                change=0.25):
+    ## Recommendation when each price, the memory per worker or all run
+    ## times change by +-change (a fraction): [(what, factor, recommendation)]
+    rows = []
+    for factor in [1. - change, 1. + change]:
+        for key in ['core', 'gb']:
+            p = dict(pricing)
+            p[key] = p.get(key, 0.) * factor
+            rows.append((key + ' price', factor, recommend(N, T, p, constraints, fits, maxWorkers, memPerWorker,
+                                                           objective)))
+            pass
+        rows.append(('memory per worker', factor, recommend(N, T, pricing, constraints, fits, maxWorkers,
+                                                            memPerWorker * factor, objective)))
+        rows.append(('run time', factor, recommend(N, T, pricing, constraints, fits, maxWorkers, memPerWorker,
+                                                   objective, timeScale=factor)))
+        pass
+    return rows
+
+
+def plotSweep(N, T, fits, workers, filename):
+    ## Measured points and fitted curves for time and cost, off screen
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(11, 5), tight_layout=True)
+    xt = fig.add_subplot(1, 2, 1)
+    xc = fig.add_subplot(1, 2, 2)
+    grid = np.unique(np.concatenate([np.geomspace(1, max(workers), 200), N]))
+    xt.plot(N, T, 'o', label='measured')
+    xc.plot(N, T * N, 'o', label='measured')
+    for (name, fit) in fits.items():
+        xt.plot(grid, predict(fit, grid), label=name)
+        xc.plot(grid, predict(fit, grid) * grid, label=name)
+        pass
+    for (x, ylabel) in [(xt, 'Time (seconds)'), (xc, 'Cost (core seconds)')]:
+        x.set_xscale('log', base=2)
+        x.set_xlabel('Workers')
+        x.set_ylabel(ylabel)
+        x.axvline(max(N), color='grey', linestyle=':')
+        x.legend()
+        pass
+    xt.set_title('Time v. Workers')
+    xc.set_title('Cost v. Workers')
+    fig.savefig(filename)
+    return
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Fit Amdahl and USL scaling models to EEPS sweep results '
+                                                 'and extrapolate time and cost to more workers.')
+    parser.add_argument('inputs', nargs='*', default=['eepsResults.csv'],
+                        help='eeps.py results CSV files, monitoring databases or directories of them '
+                             '(default = %(default)s)')
+    parser.add_argument('-w', '--workers', type=float, nargs='+', default=None,
+                        help='worker counts to extrapolate to (default = 2x, 4x, 8x, 16x the largest measured)')
+    parser.add_argument('--plot', default=None, help='save a time and cost plot to this file')
+    parser.add_argument('--corePrice', type=float, default=None, help='price per core-hour (enables recommendation)')
+    parser.add_argument('--gbPrice', type=float, default=0., help='price per GB-hour of memory (default = %(default)s)')
+    parser.add_argument('--billing', type=float, default=3600.,
+                        help='billing increment in seconds (default = %(default)s)')
+    parser.add_argument('--minBilling', type=float, default=0., help='minimum billed seconds (default = %(default)s)')
+    parser.add_argument('--memPerWorker', type=float, default=2., help='GB of memory per worker (default = %(default)s)')
+    parser.add_argument('--deadline', type=float, default=None, help='maximum run time in seconds')
+    parser.add_argument('--budget', type=float, default=None, help='maximum price of one run')
+    parser.add_argument('--maxRAM', type=float, default=None, help='maximum instance memory in GB')
+    parser.add_argument('--maxWorkers', type=int, default=None,
+                        help='largest worker count considered (default = 4x the largest measured)')
+    parser.add_argument('--objective', choices=['price', 'time'], default='price',
+                        help='cheapest run meeting the deadline, or fastest within budget (default = %(default)s)')
+    args = parser.parse_args()
+
+    for path in args.inputs:
+        if not os.path.exists(path):
+            print("%ERROR: sweep results not found, ", path)
+            sys.exit(1)
+        pass
+
+    (N, T) = loadSweep(args.inputs)
+    if len(N) < 2:
+        print(f'%ERROR: need results for at least 2 worker counts to fit, found {len(N)}')
+        sys.exit(1)
+    fits = fitSweep(N, T)
+
+    print(f'Scaling fits to {len(N)} worker counts ({N.min():g}-{N.max():g}). Time in seconds.')
+    rows = []
+    for (name, fit) in fits.items():
+        rows.append([name, fit['T1'], fit['sigma'], fit['kappa'], fit['peak'], fit['r2'], fit['rmsPct']])
+        pass
+    print(tabulate(rows, headers=['model', 'T1', 'sigma', 'kappa', 'peak workers', 'R^2', 'rms error %'],
+                   tablefmt='grid', floatfmt='.4g', missingval='-'))
+
+    workers = args.workers
+    if workers is None: workers = [N.max() * k for k in [2, 4, 8, 16]]
+    print(f'\nMeasured and predicted time and cost (core seconds = time x workers)')
+    rows = []
+    for n in sorted(set(N.tolist()) | set(workers)):
+        measured = T[N == n]
+        row = [n, measured[0] if len(measured) else None, measured[0] * n if len(measured) else None]
+        for fit in fits.values():
+            t = float(predict(fit, [n])[0])
+            row += [t, t * n]
+            pass
+        rows.append(row)
+        pass
+    headers = ['workers', 'time', 'cost']
+    for name in fits:
+        headers += [f'{name} time', f'{name} cost']
+        pass
+    print(tabulate(rows, headers=headers, tablefmt='grid', floatfmt='.2f', missingval='-'))
+
+    if args.plot is not None:
+        plotSweep(N, T, fits, workers, args.plot)
+        print(f'Plot saved to {args.plot}')
+        pass
+
+    if args.corePrice is not None:
+        pricing = {'core': args.corePrice, 'gb': args.gbPrice, 'increment': args.billing, 'minimum': args.minBilling}
+        constraints = {'deadline': args.deadline, 'budget': args.budget, 'ram': args.maxRAM}
+        best = recommend(N, T, pricing, constraints, fits, args.maxWorkers, args.memPerWorker, args.objective)
+        print(f'\nRecommendation ({"cheapest" if args.objective == "price" else "fastest"} run meeting the '
+              f'constraints; {args.memPerWorker:g} GB per worker)')
+        if best is None:
+            print('%WARNING: no worker count meets the constraints')
+        else:
+            print(f'Workers: {best["workers"]:g} (cores_per_worker=1, instance with {best["cores"]:g} cores and '
+                  f'{best["ram"]:g} GB)')
+            print(f'Time: {best["time"]:.2f} seconds ({best["source"]}), price: {best["price"]:.4f}')
+            pass
+        rows = []
+        for (what, factor, r) in sensitivity(N, T, pricing, constraints, fits, args.maxWorkers, args.memPerWorker,
+                                              args.objective):
+            if r is None:
+                rows.append([what, f'x{factor:g}', None, None, None, None])
+            else:
+                rows.append([what, f'x{factor:g}', r['workers'], r['time'], r['price'], r['source']])
+                pass
+            pass
+        print('\nSensitivity of the recommendation')
+        print(tabulate(rows, headers=['change', 'factor', 'workers', 'time', 'price', 'source'],
+                       tablefmt='grid', floatfmt='.4g', missingval='none'))
+        pass